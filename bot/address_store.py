@@ -0,0 +1,393 @@
+import bisect
+import heapq
+import json
+import os
+import sys
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+from itertools import count, islice
+from bot.snapshot import SnapshotError, read_snapshot, write_snapshot
+
+DATA_PATH = 'data/kodepos.json'
+SNAPSHOT_PATH = 'data/kodepos.snapshot'
+SEARCH_FIELDS = ['kelurahan', 'kecamatan', 'kota', 'provinsi']
+FILTER_FIELDS = SEARCH_FIELDS + ['kode_pos']
+RECORD_FIELDS = SEARCH_FIELDS + ['kode_pos', 'kode_kemendagri']
+
+_generations = count(1)
+
+
+def is_postal_code(term):
+    return term.isascii() and term.isdigit()
+
+
+def parse_query(query):
+    filters = {}
+    general_terms = []
+    parts = query.split()
+
+    # Hanya query yang seluruhnya angka dianggap awalan kode pos. Angka di
+    # tengah teks bebas ("Pasar 3", "2 Ilir") tetap dicari sebagai teks.
+    if parts and all(is_postal_code(part) for part in parts):
+        return filters, general_terms, parts
+
+    for part in parts:
+        if ':' in part:
+            key, value = part.split(':', 1)
+            filters[key.lower().strip()] = value.strip().lower()
+        else:
+            general_terms.append(part.strip().lower())
+
+    return filters, general_terms, []
+
+
+def normalize_query(query):
+    filters, general_terms, postal_prefixes = parse_query(query)
+    return (
+        tuple(sorted((field, value) for field, value in filters.items() if field in FILTER_FIELDS)),
+        tuple(sorted(set(general_terms))),
+        tuple(sorted(set(postal_prefixes)))
+    )
+
+
+def _compact_postings(index):
+    return {token: array('I', postings) for token, postings in index.items()}
+
+
+def _merge_postings(postings):
+    if len(postings) == 1:
+        yield from postings[0]
+        return
+
+    last = None
+    for row_id in heapq.merge(*postings):
+        if row_id != last:
+            yield row_id
+            last = row_id
+
+
+def _sorted_union(postings):
+    # Tetap mengurutkan row ID (integer, di C), bukan merge: untuk term
+    # pendek yang cocok dengan ribuan token, set + sorted beberapa kali lebih
+    # cepat daripada heapq.merge di Python. Record tidak pernah diurutkan.
+    if len(postings) == 1:
+        return postings[0]
+    rows = set()
+    for rows_part in postings:
+        rows.update(rows_part)
+    return array('I', sorted(rows))
+
+
+def _membership(postings):
+    if len(postings) > 4:
+        return set(_merge_postings(postings)).__contains__
+
+    def contains(row_id):
+        for rows in postings:
+            pos = bisect.bisect_left(rows, row_id)
+            if pos < len(rows) and rows[pos] == row_id:
+                return True
+        return False
+    return contains
+
+
+class AddressRecord(Mapping):
+    __slots__ = ('store', 'row_id')
+
+    def __init__(self, store, row_id):
+        self.store = store
+        self.row_id = row_id
+
+    def __getitem__(self, field):
+        column = self.store.columns.get(field)
+        if column is None:
+            raise KeyError(field)
+        return self.store.values[column[self.row_id]]
+
+    def __iter__(self):
+        return iter(RECORD_FIELDS)
+
+    def __len__(self):
+        return len(RECORD_FIELDS)
+
+    def __repr__(self):
+        return f"AddressRecord({dict(self)!r})"
+
+
+class SearchCursor(Sequence):
+    # Hasil pencarian disimpan sebagai query + daftar row ID saja; record
+    # baru dibuat saat halaman yang bersangkutan ditampilkan.
+    __slots__ = ('store', 'query', 'row_ids', '__weakref__')
+
+    def __init__(self, store, query, row_ids):
+        self.store = store
+        self.query = query
+        self.row_ids = row_ids
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [AddressRecord(self.store, row_id) for row_id in self.row_ids[idx]]
+        return AddressRecord(self.store, self.row_ids[idx])
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def page_count(self, per_page):
+        return (len(self.row_ids) + per_page - 1) // per_page
+
+    def page(self, page, per_page):
+        start = (page - 1) * per_page
+        return self[start:start + per_page]
+
+class AddressStore:
+    def __init__(self, values, columns, field_index, text_index, kode_pos_index):
+        # Nilai (nama wilayah, kode pos, dst.) disimpan sekali di tabel
+        # values; setiap kolom hanya menyimpan ID integer ke tabel tersebut.
+        self.values = values
+        self.columns = columns
+        self.field_index = field_index
+        self.text_index = text_index
+        self.kode_pos_index = kode_pos_index
+        self.kode_pos_keys = sorted(kode_pos_index)
+        self.size = len(columns['kode_pos'])
+        self.generation = next(_generations)
+
+    @classmethod
+    def from_entries(cls, entries):
+        # Row ID sekaligus menjadi peringkat kanonik (provinsi, kota,
+        # kecamatan, kelurahan), sehingga hasil pencarian tidak perlu
+        # diurutkan per record.
+        entries = sorted(entries, key=lambda x: (
+            x['provinsi'],
+            x['kota'],
+            x['kecamatan'],
+            x['kelurahan']
+        ))
+        values = []
+        columns = {field: array('I') for field in RECORD_FIELDS}
+        value_ids = {}
+
+        field_index = {field: {} for field in SEARCH_FIELDS}
+        text_index = {}
+        kode_pos_index = {}
+
+        for row_id, entry in enumerate(entries):
+            for field in RECORD_FIELDS:
+                value = entry.get(field, '')
+                key = (type(value), value)
+                value_id = value_ids.get(key)
+                if value_id is None:
+                    value_id = value_ids[key] = len(values)
+                    values.append(sys.intern(value) if isinstance(value, str) else value)
+                columns[field].append(value_id)
+
+            row_tokens = set()
+            for field in SEARCH_FIELDS:
+                tokens = set(str(entry.get(field, '')).lower().split())
+                for token in tokens:
+                    field_index[field].setdefault(token, []).append(row_id)
+                row_tokens.update(tokens)
+            for token in row_tokens:
+                text_index.setdefault(token, []).append(row_id)
+
+            kode_pos = str(entry.get('kode_pos', '')).lower()
+            kode_pos_index.setdefault(kode_pos, []).append(row_id)
+
+        return cls(
+            values,
+            columns,
+            {field: _compact_postings(index) for field, index in field_index.items()},
+            _compact_postings(text_index),
+            _compact_postings(kode_pos_index)
+        )
+
+    @classmethod
+    def load(cls, path=DATA_PATH):
+        with open(path) as f:
+            return cls.from_entries(json.load(f))
+
+    @classmethod
+    def from_snapshot(cls, snapshot_path=SNAPSHOT_PATH, source_path=DATA_PATH):
+        parts = read_snapshot(snapshot_path, source_path)
+        return cls(
+            parts['values'],
+            parts['columns'],
+            parts['field_index'],
+            parts['text_index'],
+            parts['kode_pos_index']
+        )
+
+    def save_snapshot(self, snapshot_path=SNAPSHOT_PATH, source_path=DATA_PATH):
+        write_snapshot(snapshot_path, source_path, {
+            'values': self.values,
+            'columns': self.columns,
+            'field_index': self.field_index,
+            'text_index': self.text_index,
+            'kode_pos_index': self.kode_pos_index
+        })
+
+    def __len__(self):
+        return self.size
+
+    def record(self, row_id):
+        return AddressRecord(self, row_id)
+
+    def _lookup(self, index, term):
+        # Term tidak mengandung spasi, jadi "term in field" setara dengan
+        # term merupakan substring dari salah satu token field tersebut.
+        return [postings for token, postings in index.items() if term in token]
+
+    def lookup_kode_pos(self, kode_pos):
+        return self.kode_pos_index.get(kode_pos, array('I'))
+
+    def _kode_pos_prefix_postings(self, prefix):
+        postings = []
+        keys = self.kode_pos_keys
+        pos = bisect.bisect_left(keys, prefix)
+        while pos < len(keys) and keys[pos].startswith(prefix):
+            postings.append(self.kode_pos_index[keys[pos]])
+            pos += 1
+        return postings
+
+    def _constraints(self, filters, general_terms, postal_prefixes):
+        for field in FILTER_FIELDS:
+            if field not in filters:
+                continue
+            value = filters[field]
+            if field == 'kode_pos':
+                yield [self.lookup_kode_pos(value)]
+            elif value:
+                yield self._lookup(self.field_index[field], value)
+
+        for prefix in postal_prefixes:
+            yield self._kode_pos_prefix_postings(prefix)
+
+        for term in general_terms:
+            yield self._lookup(self.text_index, term)
+
+    def search(self, query, limit=None):
+        filters, general_terms, postal_prefixes = parse_query(query)
+        constraints = list(self._constraints(filters, general_terms, postal_prefixes))
+
+        if not constraints:
+            end = self.size if limit is None else min(limit, self.size)
+            return SearchCursor(self, query, range(end))
+
+        sizes = [sum(len(postings) for postings in constraint) for constraint in constraints]
+        if not all(sizes):
+            return SearchCursor(self, query, array('I'))
+
+        # Baris sudah tersimpan dalam urutan kanonik, jadi posting list
+        # terurut dan urutan row ID sama dengan urutan hasil.
+        order = sorted(range(len(constraints)), key=sizes.__getitem__)
+        driver = constraints[order[0]]
+        members = [_membership(constraints[i]) for i in order[1:]]
+
+        # Tanpa limit, union memakai _sorted_union (sort row ID); dengan
+        # limit, heap merge berhenti begitu hasil cukup.
+        if not members:
+            if limit is None:
+                # Satu posting list bisa dipakai langsung tanpa disalin.
+                return SearchCursor(self, query, _sorted_union(driver))
+            return SearchCursor(self, query, array('I', islice(_merge_postings(driver), limit)))
+
+        candidates = _sorted_union(driver) if limit is None else _merge_postings(driver)
+
+        row_ids = array('I')
+        for row_id in candidates:
+            if all(contains(row_id) for contains in members):
+                row_ids.append(row_id)
+                if limit is not None and len(row_ids) >= limit:
+                    break
+        return SearchCursor(self, query, row_ids)
+
+
+def load_store(path=DATA_PATH, snapshot_path=SNAPSHOT_PATH):
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            return AddressStore.from_snapshot(snapshot_path, path)
+        except SnapshotError as e:
+            print(f"Snapshot tidak dipakai, memuat {path}: {str(e)}")
+    return AddressStore.load(path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = load_store()
+    return _store
+
+
+def set_store(store):
+    # Cukup satu assignment: pencarian yang sedang berjalan, sesi dan cursor
+    # tetap memegang referensi ke generasi lama sampai selesai dipakai.
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class StoreReloader:
+    def __init__(self, interval=60, path=DATA_PATH, snapshot_path=SNAPSHOT_PATH, on_reload=None):
+        self.interval = interval
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.on_reload = on_reload
+        self.stamp = self._stamp()
+        self.pending = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _stamp(self):
+        return _file_stamp(self.path), _file_stamp(self.snapshot_path)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _watch(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            self.pending = None
+            return False
+
+        # File yang masih ditulis ukurannya/mtime-nya terus berubah; tunggu
+        # sampai stempel stabil selama satu interval sebelum dimuat ulang.
+        if stamp != self.pending:
+            self.pending = stamp
+            return False
+
+        try:
+            store = load_store(self.path, self.snapshot_path)
+        except Exception as e:
+            print(f"Gagal memuat ulang data alamat: {str(e)}")
+            return False
+
+        self.stamp = stamp
+        self.pending = None
+        set_store(store)
+        if self.on_reload:
+            self.on_reload(store)
+        print(f"Data alamat dimuat ulang: {len(store)} entri")
+        return True
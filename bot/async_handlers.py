@@ -0,0 +1,172 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from aiohttp import web
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import Update
+from bot import handlers, metrics
+from bot.address_store import get_store, StoreReloader
+from bot.bot_handlers import DATA_RELOAD_INTERVAL
+from bot.bot_utils import search_cache
+from bot.handlers import register_metrics
+from bot.result_view import TOKEN_PREFIX
+from bot.send_scheduler import Outbox, SendScheduler, SEND_RESULT_TIMEOUT
+
+# Pekerjaan CPU (pencarian) dan I/O blocking (API Mengantar)
+# dijalankan di executor supaya event loop tetap melayani update lain.
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("ASYNC_WORKERS", "8")))
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+def loop_caller(loop):
+    # Worker resi berjalan di thread; panggilan ke Telegram tetap dijalankan
+    # di event loop supaya sesi aiohttp tidak dipakai lintas thread.
+    def on_loop(coroutine_fn):
+        def call(*args, **kwargs):
+            future = asyncio.run_coroutine_threadsafe(coroutine_fn(*args, **kwargs), loop)
+            return future.result(timeout=SEND_RESULT_TIMEOUT)
+        return call
+    return on_loop
+
+
+def loop_executor(loop):
+    # Dipakai SendScheduler: sender thread menjalankan coroutine AsyncTeleBot
+    # di event loop dan menunggu hasilnya tanpa memblokir loop itu sendiri.
+    on_loop = loop_caller(loop)
+
+    def execute(fn, args, kwargs):
+        return on_loop(fn)(*args, **kwargs)
+    return execute
+
+
+def create_async_bot(token):
+    # Logika handler sama dengan runtime sinkron (bot.handlers). Handler
+    # yang membaca sesi, mencari alamat atau memanggil Mengantar dijalankan
+    # lewat run_blocking; dengan SESSION_BACKEND=sqlite pembacaan sesi pun
+    # berupa query yang bisa menunggu lock.
+    bot = AsyncTeleBot(token)
+    outbox = Outbox(bot, SendScheduler.from_env())
+
+    @bot.message_handler(commands=['start'])
+    @metrics.instrument
+    async def send_welcome(message):
+        handlers.send_welcome(outbox, message)
+
+    @bot.message_handler(commands=['bulk'])
+    @metrics.instrument
+    async def send_bulk_help(message):
+        handlers.send_bulk_help(outbox, message)
+
+    @bot.message_handler(content_types=['document'])
+    @metrics.instrument
+    async def handle_bulk_upload(message):
+        on_loop = loop_caller(asyncio.get_running_loop())
+        handlers.handle_bulk_upload(outbox, message, on_loop(bot.get_file_url))
+
+    @bot.message_handler(func=lambda m: True)
+    @metrics.instrument
+    async def handle_search(message):
+        await run_blocking(handlers.handle_search, outbox, message)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('COURIER_'))
+    @metrics.instrument
+    async def handle_courier_selection(call):
+        await run_blocking(handlers.handle_courier_selection, outbox, call)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('COD_'))
+    @metrics.instrument
+    async def handle_cod_selection(call):
+        await run_blocking(handlers.handle_cod_selection, outbox, call)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith(TOKEN_PREFIX))
+    @metrics.instrument
+    async def handle_result_token(call):
+        await run_blocking(handlers.handle_result_token, outbox, call)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('CEKONGKIR_'))
+    @metrics.instrument
+    async def handle_cek_ongkir(call):
+        await run_blocking(handlers.handle_cek_ongkir, outbox, call)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('BACK_'))
+    @metrics.instrument
+    async def handle_back(call):
+        await run_blocking(handlers.handle_back, outbox, call)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('BACKDETAIL_'))
+    @metrics.instrument
+    async def handle_back_detail(call):
+        await run_blocking(handlers.handle_back_detail, outbox, call)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('CETAKRESI_'))
+    @metrics.instrument
+    async def handle_cetak_resi(call):
+        await run_blocking(handlers.handle_cetak_resi, outbox, call)
+
+    register_metrics(outbox)
+    return bot, outbox
+
+
+async def _serve_webhook(bot, webhook_url, listen, port, secret_token):
+    path = urlparse(webhook_url).path or '/'
+    pending = set()
+
+    async def handle_update(request):
+        if secret_token and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+            return web.Response(status=403)
+
+        update = Update.de_json(await request.text())
+        # Balas Telegram segera; update diproses di task terpisah.
+        task = asyncio.create_task(bot.process_new_updates([update]))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, listen, port).start()
+    print(f"Webhook mendengarkan di {listen}:{port}{path}")
+
+    await bot.set_webhook(url=webhook_url, secret_token=secret_token)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def _run(bot, outbox, webhook_url, listen, port, secret_token):
+    outbox.scheduler.execute = loop_executor(asyncio.get_running_loop())
+    try:
+        if webhook_url:
+            await _serve_webhook(bot, webhook_url, listen, port, secret_token)
+        else:
+            await bot.remove_webhook()
+            await bot.infinity_polling()
+    finally:
+        await bot.close_session()
+
+
+def start_async_bot(token, webhook_url=None, listen='0.0.0.0', port=8080, secret_token=None):
+    try:
+        store = get_store()
+        print(f"Data alamat dimuat: {len(store)} entri")
+    except Exception as e:
+        print(f"Error loading data: {str(e)}")
+
+    if DATA_RELOAD_INTERVAL > 0:
+        StoreReloader(
+            interval=DATA_RELOAD_INTERVAL,
+            on_reload=lambda store: search_cache.clear()
+        ).start()
+
+    metrics.start_server()
+    bot, outbox = create_async_bot(token)
+    asyncio.run(_run(bot, outbox, webhook_url, listen, port, secret_token))
@@ -0,0 +1,600 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Benchmark tidak boleh ikut dibatasi rate limit Telegram sungguhan dan
+# tidak boleh menulis cache ke data/. Nilai ini harus diset sebelum modul
+# bot dibaca (beberapa konfigurasi dibaca saat import).
+BENCH_ENV = {
+    "SEND_GLOBAL_RATE": "1000000",
+    "SEND_GLOBAL_BURST": "1000000",
+    "SEND_CHAT_RATE": "1000000",
+    "SEND_CHAT_BURST": "1000000",
+    "DESTINATION_DB": "",
+}
+for _key, _value in BENCH_ENV.items():
+    os.environ.setdefault(_key, _value)
+
+from telebot import apihelper
+from telebot.types import Update
+from bot import metrics
+from bot.address_store import AddressStore, set_store
+from bot.bot_utils import search_address, search_cache, get_shipping_estimates
+from bot.mengantar_client import MengantarClient
+from bot.resi_renderer import render_resi
+from bot.result_view import ResultViews
+from bot.session_manager import SessionManager
+
+SCENARIOS = [
+    'store_build', 'search_index', 'search_cached', 'pages_cold', 'pages_warm',
+    'sessions', 'resi', 'shipping_cold', 'shipping_warm', 'telegram_search', 'telegram_page'
+]
+MEMORY_ITERATIONS = 200
+
+PROVINCES = [
+    "Aceh", "Sumatera Utara", "Sumatera Barat", "Riau", "Jambi", "Sumatera Selatan", "Bengkulu",
+    "Lampung", "Kepulauan Bangka Belitung", "Kepulauan Riau", "DKI Jakarta", "Jawa Barat",
+    "Jawa Tengah", "DI Yogyakarta", "Jawa Timur", "Banten", "Bali", "Nusa Tenggara Barat",
+    "Nusa Tenggara Timur", "Kalimantan Barat", "Kalimantan Tengah", "Kalimantan Selatan",
+    "Kalimantan Timur", "Kalimantan Utara", "Sulawesi Utara", "Sulawesi Tengah", "Sulawesi Selatan",
+    "Sulawesi Tenggara", "Gorontalo", "Sulawesi Barat", "Maluku", "Maluku Utara", "Papua Barat", "Papua"
+]
+SYLLABLES = [
+    "ba", "ka", "ja", "sa", "ri", "ma", "nu", "tu", "ra", "wa", "ngi", "lo", "se", "di",
+    "pa", "la", "gu", "ha", "ta", "su", "ci", "ke", "bo", "mo", "an", "ong", "gan", "kan"
+]
+SUFFIXES = ["Jaya", "Baru", "Indah", "Timur", "Barat", "Utara", "Selatan", "Mulya", "Sari", "Makmur", "Lama"]
+
+
+def _name(rng):
+    word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    if rng.random() < 0.3:
+        return f"{word} {rng.choice(SUFFIXES)}"
+    return word
+
+
+def generate_entries(size, seed=1):
+    # Hierarki mirip data asli: provinsi > kota > kecamatan > kelurahan,
+    # satu kode pos dipakai bersama 1-4 kelurahan di kecamatan yang sama.
+    rng = random.Random(seed)
+    entries = []
+    row = 0
+    while len(entries) < size:
+        province_index = row % len(PROVINCES)
+        provinsi = PROVINCES[province_index]
+        kota = rng.choice(["Kab. ", "Kota "]) + _name(rng)
+        for kecamatan_index in range(rng.randint(8, 16)):
+            kecamatan = _name(rng)
+            base = (20 + province_index * 2) * 1000 + rng.randint(0, 1999)
+            kode_pos = base
+            shared = 0
+            for kelurahan_index in range(rng.randint(5, 15)):
+                if shared == 0:
+                    kode_pos = base + kelurahan_index
+                    shared = rng.randint(1, 4)
+                shared -= 1
+                entries.append({
+                    "kelurahan": _name(rng),
+                    "kecamatan": kecamatan,
+                    "kota": kota,
+                    "provinsi": provinsi,
+                    "kode_pos": kode_pos,
+                    "kode_kemendagri": f"{province_index + 11}.{row % 100:02d}.{kecamatan_index:02d}.{kelurahan_index + 2001}"
+                })
+                if len(entries) >= size:
+                    return entries
+        row += 1
+    return entries
+
+
+def generate_queries(entries, count, seed=1):
+    # Campuran query: kode pos lengkap dan awalan, teks bebas (termasuk
+    # potongan kata), filter, serta kombinasi teks + filter.
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        entry = rng.choice(entries)
+        kind = rng.random()
+        word = rng.choice(entry['kelurahan'].split())
+        if kind < 0.30:
+            queries.append(str(entry['kode_pos']))
+        elif kind < 0.45:
+            queries.append(str(entry['kode_pos'])[:3])
+        elif kind < 0.65:
+            queries.append(word)
+        elif kind < 0.80:
+            start = rng.randint(0, max(0, len(word) - 4))
+            queries.append(word[start:start + rng.randint(3, 5)].lower())
+        elif kind < 0.92:
+            provinsi = entry['provinsi'].split()[-1]
+            queries.append(f"kelurahan:{word} provinsi:{provinsi}")
+        else:
+            queries.append(f"{entry['kecamatan'].split()[0]} provinsi:{entry['provinsi'].split()[0]}")
+    return queries
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, wall):
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 4),
+        'mean_ms': round(sum(values) / len(values) * 1000, 4) if values else 0,
+        'throughput_per_s': round(len(values) / wall, 2) if wall > 0 else 0
+    }
+
+
+def timed(items, fn):
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - started
+
+
+def timed_concurrent(items, fn, concurrency):
+    latencies = []
+    lock = threading.Lock()
+    chunks = [items[i::concurrency] for i in range(concurrency)]
+
+    def worker(chunk):
+        local = []
+        for item in chunk:
+            t0 = time.perf_counter()
+            fn(item)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def _start_server(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _json_response(handler, body):
+    data = json.dumps(body).encode()
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Length', str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+class StubMengantar:
+    # Pengganti app.mengantar.com dengan latensi buatan yang bisa diatur.
+    def __init__(self, delay=0.0):
+        stub = self
+        self.delay = delay
+        self.calls = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Header dan body ditulis terpisah; tanpa ini Nagle + delayed ACK
+            # menambah ~40 ms per request keep-alive.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                stub.calls += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if url.path == '/api/address/autofill':
+                    _json_response(self, {"success": True, "data": [{"_id": f"dest-{query['keyword'][0]}"}]})
+                elif url.path == '/api/order/allEstimatePublic':
+                    _json_response(self, {"success": True, "data": {
+                        "JNE": {"price": 10000, "estimate_delivery": "2-3 hari"},
+                        "SiCepat": {"price": 9000, "estimate_delivery": "2-4 hari"}
+                    }})
+                else:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+
+        self.server, self.url = _start_server(Handler)
+
+    def close(self):
+        self.server.shutdown()
+
+
+class FakeTelegram:
+    # Bot API palsu: mencatat setiap panggilan dan membangunkan virtual user
+    # yang menunggu balasan untuk chat-nya.
+    def __init__(self):
+        fake = self
+        self.lock = threading.Lock()
+        self.waiters = {}
+        self.markups = {}
+        self.message_ids = itertools.count(1)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if not params and body and 'x-www-form-urlencoded' in (self.headers.get('Content-Type') or ''):
+                    params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+                method = url.path.rsplit('/', 1)[-1]
+                _json_response(self, {"ok": True, "result": fake.record(method, params)})
+
+            do_GET = _handle
+            do_POST = _handle
+
+        self.server, self.url = _start_server(Handler)
+
+    def record(self, method, params):
+        if method == 'getMe':
+            return {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        if method == 'answerCallbackQuery':
+            return True
+
+        chat_id = int(params.get('chat_id', 0))
+        with self.lock:
+            message_id = next(self.message_ids)
+            if 'reply_markup' in params:
+                self.markups[chat_id] = json.loads(params['reply_markup'])
+            waiter = self.waiters.get(chat_id)
+            if waiter is not None and method in waiter[0]:
+                del self.waiters[chat_id]
+                waiter[1].set()
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get('text', '')
+        }
+
+    def expect(self, chat_id, methods):
+        event = threading.Event()
+        with self.lock:
+            self.waiters[chat_id] = (methods, event)
+        return event
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": "Bench"}
+
+
+def message_update(update_id, user_id, text):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _user(user_id),
+            "text": text
+        }
+    })
+
+
+def callback_update(update_id, user_id, data, message_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "hasil"
+            }
+        }
+    })
+
+
+class Benchmark:
+    def __init__(self, size, seed, iterations, concurrency, upstream_delay):
+        self.size = size
+        self.seed = seed
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.upstream_delay = upstream_delay
+        self.entries = generate_entries(size, seed)
+        self.queries = generate_queries(self.entries, iterations, seed)
+        self.store = None
+        self.update_ids = itertools.count(1)
+        # Kode pos untuk skenario dingin selalu baru agar tidak pernah kena
+        # cache tujuan maupun cache estimasi dari putaran sebelumnya.
+        self.cold_codes = itertools.count(10000)
+
+    def items(self, scenario, memory):
+        count = min(self.iterations, MEMORY_ITERATIONS) if memory else self.iterations
+        return self.queries[:count] if scenario != 'store_build' else [None]
+
+    def setup(self):
+        self.store = AddressStore.from_entries(self.entries)
+        set_store(self.store)
+        search_cache.clear()
+
+    def bench_store_build(self, items):
+        return timed(items, lambda _: AddressStore.from_entries(self.entries))
+
+    def bench_search_index(self, items):
+        return timed(items, lambda query: self.store.search(query))
+
+    def bench_search_cached(self, items):
+        for query in items:
+            search_address(query)
+        return timed(items, search_address)
+
+    def _cursors(self, items):
+        return [cursor for cursor in (self.store.search(query) for query in items) if cursor]
+
+    def bench_pages_cold(self, items):
+        # Cursor baru (bukan dari cache pencarian) sehingga memo halaman kosong.
+        views = ResultViews()
+        cursors = self._cursors(items)
+        return timed(range(len(cursors)), lambda i: views.open(i, cursors[i]).render(1))
+
+    def bench_pages_warm(self, items):
+        views = ResultViews()
+        opened = [views.open(i, cursor) for i, cursor in enumerate(self._cursors(items))]
+        for view in opened:
+            view.render(1)
+        return timed(opened, lambda view: view.render(1))
+
+    def bench_sessions(self, items):
+        manager = SessionManager()
+        cursors = self._cursors(items[:50]) or [self.store.search('')]
+        users = 1000
+
+        def round_trip(i):
+            user_id = i % users
+            cursor = cursors[i % len(cursors)]
+            manager.save_cursor(user_id, cursor)
+            manager.get_cursor(user_id)
+            manager.save_selected_address(user_id, cursor[0])
+            manager.get_selected_address(user_id)
+
+        return timed_concurrent(list(range(len(items))), round_trip, self.concurrency)
+
+    def bench_resi(self, items):
+        user_data = {
+            "name": "Penerima Benchmark", "phone": "081234567890",
+            "address": "Jl. Merdeka No. 10 RT 01 RW 02", "courier": "JNE", "cod": "YES"
+        }
+        addresses = [self.store.record(i % len(self.store)) for i in range(len(items))]
+        render_resi(user_data, addresses[0])
+        return timed(addresses, lambda address: render_resi(user_data, address)[1].getvalue())
+
+    def _postal_codes(self, count):
+        codes = sorted({str(entry['kode_pos']) for entry in self.entries})
+        random.Random(self.seed).shuffle(codes)
+        return codes[:count]
+
+    def bench_shipping_cold(self, items):
+        # Kode pos unik per iterasi: setiap panggilan ke stub (autofill + estimasi).
+        stub = StubMengantar(self.upstream_delay)
+        client = MengantarClient(base_url=stub.url, retries=0)
+        try:
+            codes = [str(next(self.cold_codes)) for _ in items]
+            return timed_concurrent(codes, lambda code: get_shipping_estimates(code, client), self.concurrency)
+        finally:
+            client.close()
+            stub.close()
+
+    def bench_shipping_warm(self, items):
+        stub = StubMengantar(self.upstream_delay)
+        client = MengantarClient(base_url=stub.url, retries=0)
+        try:
+            codes = self._postal_codes(50)
+            for code in codes:
+                get_shipping_estimates(code, client)
+            lookups = [codes[i % len(codes)] for i in range(len(items))]
+            return timed_concurrent(lookups, lambda code: get_shipping_estimates(code, client), self.concurrency)
+        finally:
+            client.close()
+            stub.close()
+
+    def _telegram(self):
+        from bot.bot_handlers import create_bot
+        telegram = FakeTelegram()
+        apihelper.API_URL = telegram.url + "/bot{0}/{1}"
+        bot, _ = create_bot("123456:BENCHMARK")
+        return telegram, bot
+
+    def _send_and_wait(self, telegram, bot, user_id, update, methods):
+        event = telegram.expect(user_id, methods)
+        bot.process_new_updates([update])
+        if not event.wait(30):
+            raise RuntimeError(f"Tidak ada balasan {methods} untuk chat {user_id}")
+
+    def bench_telegram_search(self, items):
+        telegram, bot = self._telegram()
+        try:
+            jobs = list(enumerate(items))
+
+            def search(job):
+                i, query = job
+                user_id = 1000 + i % self.concurrency
+                update = message_update(next(self.update_ids), user_id, query)
+                self._send_and_wait(telegram, bot, user_id, update, ('sendMessage',))
+
+            return timed_concurrent(jobs, search, self.concurrency)
+        finally:
+            bot.stop_bot()
+            telegram.close()
+
+    def bench_telegram_page(self, items):
+        telegram, bot = self._telegram()
+        try:
+            # Satu pencarian per virtual user, lalu tekan "Selanjutnya" berulang.
+            query = max(set(self.queries), key=lambda q: len(self.store.search(q)))
+            users = [2000 + i for i in range(self.concurrency)]
+            tokens = {}
+            for user_id in users:
+                update = message_update(next(self.update_ids), user_id, query)
+                self._send_and_wait(telegram, bot, user_id, update, ('sendMessage',))
+                tokens[user_id] = _next_page_token(telegram.markups[user_id])
+
+            def tap(i):
+                user_id = users[i % len(users)]
+                token = tokens[user_id]
+                if token is None:
+                    return
+                update = callback_update(next(self.update_ids), user_id, token, message_id=1)
+                self._send_and_wait(telegram, bot, user_id, update, ('editMessageText',))
+                tokens[user_id] = _next_page_token(telegram.markups[user_id]) or token
+
+            return timed_concurrent(list(range(len(items))), tap, self.concurrency)
+        finally:
+            bot.stop_bot()
+            telegram.close()
+
+    def run(self, scenarios, measure_memory):
+        self.setup()
+        results = {}
+        for scenario in scenarios:
+            bench = getattr(self, f"bench_{scenario}")
+            latencies, wall = bench(self.items(scenario, memory=False))
+            results[scenario] = summarize(latencies, wall)
+
+            if measure_memory:
+                # Pass terpisah dengan tracemalloc karena pelacakan alokasi
+                # memperlambat kode dan akan merusak angka latensi.
+                tracemalloc.start()
+                tracemalloc.reset_peak()
+                bench(self.items(scenario, memory=True))
+                results[scenario]['peak_alloc_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                tracemalloc.stop()
+            print(f"{scenario}: {results[scenario]}", file=sys.stderr)
+        return results
+
+
+def _next_page_token(markup):
+    for row in markup.get('inline_keyboard', []):
+        for button in row:
+            if button.get('text', '').startswith('Selanjutnya'):
+                return button['callback_data']
+    return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(baseline, current):
+    lines = []
+    for scenario, result in current['results'].items():
+        base = baseline.get('results', {}).get(scenario)
+        if not base:
+            continue
+        parts = [scenario]
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s'):
+            if base.get(metric):
+                parts.append(f"{metric} {base[metric]} -> {result[metric]} ({result[metric] / base[metric]:.2f}x)")
+        lines.append('  '.join(parts))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot dengan dataset sintetis dan API palsu")
+    parser.add_argument("--size", type=int, default=20000, help="jumlah baris kodepos sintetis")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--upstream-delay", type=float, default=0.0,
+                        help="latensi buatan stub Mengantar dalam detik")
+    parser.add_argument("--scenarios", default=','.join(SCENARIOS))
+    parser.add_argument("--no-memory", action="store_true", help="lewati pengukuran tracemalloc")
+    parser.add_argument("--output", help="tulis hasil JSON ke file (default stdout)")
+    parser.add_argument("--baseline", help="hasil JSON sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"skenario tidak dikenal: {', '.join(unknown)}")
+
+    benchmark = Benchmark(args.size, args.seed, args.iterations, args.concurrency, args.upstream_delay)
+    results = benchmark.run(scenarios, measure_memory=not args.no_memory)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dataset_size': args.size,
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'upstream_delay': args.upstream_delay,
+            'session_backend': os.getenv("SESSION_BACKEND", "memory"),
+            'metrics_enabled': metrics.ENABLED,
+            'profile_sample_rate': metrics.PROFILE_SAMPLE_RATE,
+            'started_at': datetime.now(timezone.utc).isoformat()
+        },
+        'results': results,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
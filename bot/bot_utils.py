@@ -1,99 +1,166 @@
-import json
-import requests
 import html
 import os
+import re
+import time
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+from bot import metrics
+from bot.address_store import get_store, normalize_query
+from bot.query_cache import QueryCache
+from bot.mengantar_client import get_client
+from bot.shipping_cache import get_destination_cache, get_estimate_cache
+from bot.resilience import CircuitBreaker, CircuitOpenError, SingleFlight
 
 ITEMS_PER_PAGE = 5
-
-def search_address(query):
+SHIPPING_UNAVAILABLE = "❌ Layanan cek ongkir sedang gangguan, silakan coba lagi nanti."
+
+search_cache = QueryCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "600"))
+)
+SEARCH_SECONDS = metrics.histogram('bot_search_seconds', 'Lama pencarian indeks saat cache pencarian miss')
+SEARCH_RESULTS = metrics.histogram(
+    'bot_search_results', 'Jumlah hasil per pencarian (cache miss)', buckets=metrics.SIZE_BUCKETS
+)
+shipping_flight = SingleFlight()
+shipping_breaker = CircuitBreaker(
+    'mengantar',
+    failure_rate=float(os.getenv("MENGANTAR_BREAKER_FAILURE_RATE", "0.5")),
+    min_calls=int(os.getenv("MENGANTAR_BREAKER_MIN_CALLS", "10")),
+    reset_timeout=float(os.getenv("MENGANTAR_BREAKER_RESET", "30"))
+)
+
+def search_address(query, limit=None):
     try:
-        with open('data/kodepos.json') as f:
-            data = json.load(f)
+        store = get_store()
     except Exception as e:
         print(f"Error loading data: {str(e)}")
         return []
 
-    filters = {}
-    general_terms = []
-
-    for part in query.split():
-        if ':' in part:
-            key, value = part.split(':', 1)
-            filters[key.lower().strip()] = value.strip().lower()
-        else:
-            general_terms.append(part.strip().lower())
-
-    results = []
-    for entry in data:
-        match = True
-
-        for field in ['kelurahan', 'kecamatan', 'kota', 'provinsi', 'kode_pos']:
-            if field in filters:
-                entry_value = str(entry.get(field, '')).lower()
-                filter_value = filters[field]
-
-                if field == 'kode_pos':
-                    if entry_value != filter_value:
-                        match = False
-                        break
-                else:
-                    if filter_value not in entry_value:
-                        match = False
-                        break
-
-        if match and general_terms:
-            searchable = ' '.join([
-                str(entry['kelurahan']),
-                str(entry['kecamatan']),
-                str(entry['kota']),
-                str(entry['provinsi'])
-            ]).lower()
-
-            if not all(term in searchable for term in general_terms):
-                match = False
-
-        if match:
-            results.append(entry)
-
-    return sorted(results, key=lambda x: (
-        x['provinsi'],
-        x['kota'],
-        x['kecamatan'],
-        x['kelurahan']
-    ))
-
-def get_shipping_estimates(postal_code):
+    # Cursor bersifat read-only sehingga aman dibagi antar pengguna. Generasi
+    # store ikut menjadi key, jadi hasil dari dataset lama tidak terpakai lagi.
+    key = (store.generation, normalize_query(query), limit)
+    cursor = search_cache.get(key)
+    if cursor is None:
+        started = time.perf_counter()
+        cursor = store.search(query, limit)
+        SEARCH_SECONDS.observe(time.perf_counter() - started)
+        SEARCH_RESULTS.observe(len(cursor))
+        search_cache.put(key, cursor)
+    return cursor
+
+def _call_mengantar(request, *args, **kwargs):
+    if not shipping_breaker.allow():
+        raise CircuitOpenError("Circuit Mengantar sedang terbuka")
+    try:
+        response = request(*args, **kwargs)
+    except Exception:
+        shipping_breaker.record_failure()
+        raise
+
+    if response.status_code >= 500 or response.status_code == 429:
+        shipping_breaker.record_failure()
+    else:
+        shipping_breaker.record_success()
+    return response
+
+def _lookup_destination_id(postal_code, client):
+    destination_cache = get_destination_cache()
+    destination_id = destination_cache.get(postal_code)
+    if destination_id:
+        return destination_id, None
+
+    response = _call_mengantar(client.autofill, postal_code)
+    if response.status_code != 200:
+        return None, "❌ Terjadi kesalahan saat menghubungi API Mengantar."
+
+    data = response.json()
+    if not (data.get("success") and data.get("data")):
+        return None, "❌ Tidak ditemukan alamat yang cocok di Mengantar."
+
+    destination_id = data["data"][0]["_id"]
+    destination_cache.put(postal_code, destination_id)
+    return destination_id, None
+
+def _fetch_estimates(origin_id, destination_id, weight, client):
+    estimate_response = _call_mengantar(client.estimate, origin_id, destination_id, weight=weight)
+    if estimate_response.status_code == 200:
+        estimate_data = estimate_response.json()
+        if estimate_data.get("success") and estimate_data.get("data"):
+            return estimate_data["data"]
+        return "❌ Tidak ada estimasi biaya pengiriman yang tersedia."
+    return "❌ Gagal mendapatkan estimasi biaya pengiriman."
+
+def _fresh_estimates(origin_id, destination_id, weight, client):
+    estimates = _fetch_estimates(origin_id, destination_id, weight, client)
+    return None if isinstance(estimates, str) else estimates
+
+def get_shipping_estimates(postal_code, client=None):
     origin_id = os.getenv("ORIGIN_ID", "5fc62debf8f44b34aa4bded9")
-    autofill_url = f"https://app.mengantar.com/api/address/autofill?keyword={postal_code}"
-    
+    client = client or get_client()
+
+    # Pengguna yang menekan "Cek Ongkir" untuk kode pos yang sama secara
+    # bersamaan berbagi satu panggilan ke Mengantar.
+    return shipping_flight.do(
+        (origin_id, str(postal_code)),
+        lambda: _get_shipping_estimates(postal_code, origin_id, client)
+    )
+
+def _get_shipping_estimates(postal_code, origin_id, client):
+    weight = 1
+
     try:
-        response = requests.get(autofill_url)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("success") and data.get("data"):
-                destination = data["data"][0]
-                destination_id = destination["_id"]
-
-                estimate_url = f"https://app.mengantar.com/api/order/allEstimatePublic?origin_id={origin_id}&destination_id={destination_id}&weight=1"
-                estimate_response = requests.get(estimate_url)
-                if estimate_response.status_code == 200:
-                    estimate_data = estimate_response.json()
-                    if estimate_data.get("success") and estimate_data.get("data"):
-                        return estimate_data["data"]
-                    return "❌ Tidak ada estimasi biaya pengiriman yang tersedia."
-                return "❌ Gagal mendapatkan estimasi biaya pengiriman."
-            return "❌ Tidak ditemukan alamat yang cocok di Mengantar."
-        return "❌ Terjadi kesalahan saat menghubungi API Mengantar."
+        destination_id, error = _lookup_destination_id(postal_code, client)
+        if error:
+            return error
+
+        estimate_cache = get_estimate_cache()
+        key = (origin_id, destination_id, weight)
+        estimates, fresh = estimate_cache.get(key)
+        if estimates is not None:
+            if not fresh and not shipping_breaker.is_open():
+                estimate_cache.refresh(key, lambda: _fresh_estimates(origin_id, destination_id, weight, client))
+            return estimates
+
+        estimates = _fetch_estimates(origin_id, destination_id, weight, client)
+        if not isinstance(estimates, str):
+            estimate_cache.put(key, estimates)
+        return estimates
+    except CircuitOpenError:
+        return SHIPPING_UNAVAILABLE
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
-def format_results_message(results, page):
+def format_shipping_estimates(estimates):
+    if isinstance(estimates, str):
+        return estimates
+
+    response_text = "🚚 ESTIMASI BIAYA PENGIRIMAN\n"
+    for courier_name, courier_info in estimates.items():
+        price = courier_info.get("price", "Tidak diketahui")
+        estimate_delivery = courier_info.get("estimate_delivery", "Tidak diketahui")
+        response_text += (
+            f"🚚 Kurir: {courier_name}\n"
+            f"💰 Harga: Rp {price}\n"
+            f"⏱️ Estimasi Pengiriman: {estimate_delivery}\n\n"
+        )
+    return response_text
+
+def format_address_detail(address):
+    return (
+        "🔍 DETAIL LENGKAP\n"
+        f"🏘️ Kelurahan: {html.escape(address['kelurahan'])}\n"
+        f"📍 Kecamatan: {html.escape(address['kecamatan'])}\n"
+        f"🏙️ Kota/Kab: {html.escape(address['kota'])}\n"
+        f"🌏 Provinsi: {html.escape(address['provinsi'])}\n"
+        f"📮 Kode Pos: {address['kode_pos']}\n"
+        f"🔑 Kode Kemendagri: {html.escape(address['kode_kemendagri'])}"
+    )
+
+def format_results_message(cursor, page):
     start = (page-1) * ITEMS_PER_PAGE
-    end = start + ITEMS_PER_PAGE
     response = []
 
-    for idx, entry in enumerate(results[start:end], start=1):
+    for idx, entry in enumerate(cursor.page(page, ITEMS_PER_PAGE), start=1):
         global_number = start + idx
         response.append(
             f"<b>🔢 HASIL {global_number}</b>\n"
@@ -105,28 +172,6 @@ def format_results_message(results, page):
         )
     return '\n\n'.join(response)
 
-def create_number_buttons(results, page, user_id):
-    markup = InlineKeyboardMarkup()
-    start = (page-1) * ITEMS_PER_PAGE
-
-    row = []
-    for idx in range(len(results[start:start+ITEMS_PER_PAGE])):
-        global_number = start + idx + 1
-        row.append(InlineKeyboardButton(str(global_number), callback_data=f"PILIH_{user_id}_{start+idx}"))
-    markup.row(*row)
-
-    nav_buttons = []
-    total_pages = (len(results) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Sebelumnya", callback_data=f"HALAMAN_{user_id}_{page-1}"))
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton("Selanjutnya ➡️", callback_data=f"HALAMAN_{user_id}_{page+1}"))
-
-    if nav_buttons:
-        markup.row(*nav_buttons)
-
-    return markup
-
 def create_detail_buttons(user_id):
     markup = InlineKeyboardMarkup()
     markup.add(InlineKeyboardButton("🔙 Kembali ke Hasil", callback_data=f"BACK_{user_id}"))
@@ -138,3 +183,27 @@ def create_back_button(user_id):
     markup = InlineKeyboardMarkup()
     markup.add(InlineKeyboardButton("🔙 Kembali ke Detail", callback_data=f"BACKDETAIL_{user_id}"))
     return markup
+
+def create_courier_buttons(user_id):
+    markup = InlineKeyboardMarkup()
+    markup.add(InlineKeyboardButton("JNE", callback_data=f"COURIER_{user_id}_JNE"))
+    markup.add(InlineKeyboardButton("J&T", callback_data=f"COURIER_{user_id}_J&T"))
+    markup.add(InlineKeyboardButton("SiCepat", callback_data=f"COURIER_{user_id}_SiCepat"))
+    markup.add(InlineKeyboardButton("Lion Parcel", callback_data=f"COURIER_{user_id}_LionParcel"))
+    return markup
+
+def create_cod_buttons(user_id):
+    markup = InlineKeyboardMarkup()
+    markup.add(InlineKeyboardButton("COD ❌", callback_data=f"COD_{user_id}_NO"))
+    markup.add(InlineKeyboardButton("COD ✅", callback_data=f"COD_{user_id}_YES"))
+    return markup
+
+def validate_user(call):
+    try:
+        expected_user = int(call.data.split('_')[1])
+        return call.from_user.id == expected_user
+    except:
+        return False
+
+def sanitize_filename(filename):
+    return re.sub(r'[\\/*?:"<>|]', "_", filename)
@@ -0,0 +1,356 @@
+import csv
+import io
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import requests
+from openpyxl import load_workbook
+from bot.address_store import get_store
+from bot.bot_utils import sanitize_filename
+from bot.resi_renderer import get_template, resi_cells
+from bot.send_scheduler import SEND_RESULT_TIMEOUT
+
+BULK_EXTENSIONS = ('.xlsx', '.csv')
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "2000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))
+# Batas upload dokumen bot Telegram 50 MB; sisakan ruang untuk overhead.
+BULK_MAX_PART_BYTES = int(os.getenv("BULK_MAX_PART_BYTES", str(45 * 1024 * 1024)))
+BULK_SPOOL_BYTES = 8 * 1024 * 1024
+BULK_ERROR_PREVIEW = 10
+DOWNLOAD_TIMEOUT = (5, 60)
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+COURIERS = ['JNE', 'J&T', 'SiCepat', 'LionParcel']
+COD_VALUES = {
+    'yes': 'YES', 'ya': 'YES', 'iya': 'YES', 'y': 'YES', '1': 'YES', 'true': 'YES',
+    'no': 'NO', 'tidak': 'NO', 'n': 'NO', '0': 'NO', 'false': 'NO', '': 'NO'
+}
+REQUIRED_COLUMNS = ['nama', 'hp', 'alamat', 'kode_pos', 'kurir']
+COLUMN_ALIASES = {
+    'name': 'nama', 'nama_penerima': 'nama',
+    'phone': 'hp', 'no_hp': 'hp', 'nomor_hp': 'hp', 'telepon': 'hp',
+    'address': 'alamat', 'alamat_lengkap': 'alamat',
+    'kodepos': 'kode_pos', 'postal_code': 'kode_pos',
+    'courier': 'kurir', 'jasa_kirim': 'kurir'
+}
+
+BULK_HELP = (
+    "📑 RESI MASSAL\n"
+    "Kirim file .xlsx atau .csv dengan baris pertama berisi kolom:\n"
+    "nama, hp, alamat, kode_pos, kurir, cod\n"
+    "Kolom kelurahan opsional, dipakai jika satu kode pos mencakup beberapa kelurahan.\n"
+    f"Kurir: {', '.join(COURIERS)}. COD: ya/tidak.\n"
+    f"Maksimal {BULK_MAX_ROWS} baris per file."
+)
+
+bulk_executor = ThreadPoolExecutor(max_workers=int(os.getenv("BULK_RENDER_WORKERS", "4")))
+
+
+class BulkFileError(Exception):
+    pass
+
+
+def is_bulk_file(file_name):
+    return bool(file_name) and file_name.lower().endswith(BULK_EXTENSIONS)
+
+
+def _column_name(header):
+    name = re.sub(r'[\s\-]+', '_', str(header or '').strip().lower())
+    return COLUMN_ALIASES.get(name, name)
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(text, dialect)
+
+
+def _iter_xlsx(stream):
+    # read_only membaca sheet baris demi baris tanpa memuat seluruh workbook.
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(file_name, stream):
+    # Menghasilkan (nomor baris, dict kolom) untuk setiap baris data.
+    if not is_bulk_file(file_name):
+        raise BulkFileError("Format file tidak didukung, kirim .xlsx atau .csv")
+    reader = _iter_csv(stream) if file_name.lower().endswith('.csv') else _iter_xlsx(stream)
+
+    try:
+        header = [_column_name(value) for value in next(reader)]
+    except StopIteration:
+        raise BulkFileError("File kosong")
+    except (csv.Error, UnicodeDecodeError, zipfile.BadZipFile, KeyError) as e:
+        raise BulkFileError(f"File tidak bisa dibaca: {str(e)}")
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise BulkFileError(f"Kolom wajib tidak ada: {', '.join(missing)}")
+
+    for row_number, values in enumerate(reader, start=2):
+        row = {column: _cell_text(value) for column, value in zip(header, values) if column}
+        if any(row.values()):
+            yield row_number, row
+
+
+def _normalize_phone(phone):
+    phone = re.sub(r'[\s\-]', '', phone)
+    if phone.startswith('+62'):
+        phone = '0' + phone[3:]
+    elif phone.startswith('8'):
+        # Excel membuang nol di depan jika kolom HP berformat angka.
+        phone = '0' + phone
+    return phone
+
+
+def _normalize_courier(courier):
+    key = courier.replace(' ', '').lower()
+    for name in COURIERS:
+        if name.lower() == key:
+            return name
+    return None
+
+
+def validate_row(row):
+    # Aturan validasi sama dengan percakapan cetak resi.
+    name = row.get('nama', '')
+    if len(name) < 3:
+        raise ValueError("Nama minimal 3 karakter")
+
+    phone = _normalize_phone(row.get('hp', ''))
+    if not phone.isdigit() or len(phone) < 10:
+        raise ValueError("Nomor HP tidak valid")
+
+    address = row.get('alamat', '')
+    if len(address) < 10:
+        raise ValueError("Alamat terlalu pendek")
+
+    kode_pos = row.get('kode_pos', '')
+    if not kode_pos.isdigit():
+        raise ValueError(f"Kode pos tidak valid: {kode_pos}")
+
+    courier = _normalize_courier(row.get('kurir', ''))
+    if courier is None:
+        raise ValueError(f"Kurir tidak dikenal: {row.get('kurir', '')}")
+
+    cod = COD_VALUES.get(row.get('cod', '').lower())
+    if cod is None:
+        raise ValueError(f"Nilai COD tidak valid: {row.get('cod', '')}")
+
+    user_data = {"name": name, "phone": phone, "address": address, "courier": courier, "cod": cod}
+    return user_data, kode_pos
+
+
+def _resolve_addresses(store, kode_pos_list):
+    return {
+        kode_pos: [store.record(row_id) for row_id in store.lookup_kode_pos(kode_pos)]
+        for kode_pos in set(kode_pos_list)
+    }
+
+
+def _pick_address(candidates, kode_pos, kelurahan):
+    if not candidates:
+        raise ValueError(f"Kode pos {kode_pos} tidak ditemukan")
+    if kelurahan:
+        for address in candidates:
+            if address['kelurahan'].lower() == kelurahan.lower():
+                return address
+        raise ValueError(f"Kelurahan {kelurahan} tidak ada di kode pos {kode_pos}")
+    if len(candidates) > 1:
+        raise ValueError(
+            f"Kode pos {kode_pos} mencakup {len(candidates)} kelurahan, isi kolom kelurahan"
+        )
+    return candidates[0]
+
+
+def _render(job):
+    row_number, user_data, address = job
+    document = get_template().render(resi_cells(user_data, address))
+    return f"{row_number:05d}_{sanitize_filename(user_data['name'])}.xlsx", document.getvalue()
+
+
+class _PartWriter:
+    # Zip hasil ditulis ke file sementara (di memori sampai BULK_SPOOL_BYTES)
+    # dan dipecah per bagian agar tidak melewati batas upload Telegram.
+    def __init__(self, on_part, max_bytes):
+        self.on_part = on_part
+        self.max_bytes = max_bytes
+        self.parts = 0
+        self.file = None
+        self.archive = None
+
+    def _open(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_BYTES)
+        # Tiap label sudah berupa zip terkompresi; kompresi ulang sia-sia.
+        self.archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_STORED)
+
+    def write(self, name, data):
+        if self.archive is not None and self.file.tell() + len(data) > self.max_bytes:
+            self.flush()
+        if self.archive is None:
+            self._open()
+        self.archive.writestr(name, data)
+
+    def flush(self):
+        if self.archive is None:
+            return
+        self.archive.close()
+        self.parts += 1
+        self.file.seek(0)
+        try:
+            self.on_part(self.file, self.parts)
+        finally:
+            self.file.close()
+            self.archive = None
+            self.file = None
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.file.close()
+            self.archive = None
+            self.file = None
+
+
+def generate_bulk_resi(file_name, stream, on_part, chunk_size=BULK_CHUNK_SIZE,
+                       max_rows=BULK_MAX_ROWS, max_part_bytes=BULK_MAX_PART_BYTES):
+    # Baris dibaca per chunk: validasi, resolusi kode pos sekaligus untuk
+    # satu chunk, lalu render paralel. Urutan label mengikuti urutan baris.
+    store = get_store()
+    summary = {'rows': 0, 'success': 0, 'errors': []}
+    writer = _PartWriter(on_part, max_part_bytes)
+    rows = iter_rows(file_name, stream)
+    limited = islice(rows, max_rows)
+
+    try:
+        while True:
+            chunk = list(islice(limited, chunk_size))
+            if not chunk:
+                break
+
+            validated = []
+            for row_number, row in chunk:
+                summary['rows'] += 1
+                try:
+                    user_data, kode_pos = validate_row(row)
+                    validated.append((row_number, row, user_data, kode_pos))
+                except ValueError as e:
+                    summary['errors'].append((row_number, str(e)))
+
+            resolved = _resolve_addresses(store, [item[3] for item in validated])
+            jobs = []
+            for row_number, row, user_data, kode_pos in validated:
+                try:
+                    address = _pick_address(resolved[kode_pos], kode_pos, row.get('kelurahan'))
+                    jobs.append((row_number, user_data, address))
+                except ValueError as e:
+                    summary['errors'].append((row_number, str(e)))
+
+            for name, data in bulk_executor.map(_render, jobs):
+                writer.write(name, data)
+                summary['success'] += 1
+
+        overflow = next(rows, None)
+        if overflow is not None:
+            summary['errors'].append(
+                (overflow[0], f"Melebihi batas {max_rows} baris, baris ini dan setelahnya tidak diproses")
+            )
+
+        if summary['success']:
+            if summary['errors']:
+                errors = io.StringIO()
+                csv_writer = csv.writer(errors)
+                csv_writer.writerow(['baris', 'error'])
+                csv_writer.writerows(sorted(summary['errors']))
+                writer.write('errors.csv', errors.getvalue().encode('utf-8-sig'))
+            writer.flush()
+    finally:
+        writer.close()
+
+    summary['errors'].sort()
+    summary['parts'] = writer.parts
+    return summary
+
+
+def format_bulk_summary(summary):
+    errors = summary['errors']
+    lines = [f"✅ Resi massal selesai: {summary['success']} berhasil, {len(errors)} gagal"]
+    for row_number, message in errors[:BULK_ERROR_PREVIEW]:
+        lines.append(f"• Baris {row_number}: {message}")
+    if len(errors) > BULK_ERROR_PREVIEW:
+        lines.append(f"...dan {len(errors) - BULK_ERROR_PREVIEW} error lainnya")
+    if errors and summary['success']:
+        lines.append("Daftar lengkap ada di errors.csv dalam file zip.")
+    return "\n".join(lines)
+
+
+def download_upload(url):
+    # File unggahan ditulis bertahap ke file sementara (di memori sampai
+    # BULK_SPOOL_BYTES); openpyxl read_only butuh stream yang bisa di-seek.
+    upload = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_BYTES)
+    try:
+        with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_BYTES):
+                upload.write(chunk)
+    except Exception:
+        upload.close()
+        raise
+    upload.seek(0)
+    return upload
+
+
+def process_bulk_resi(outbox, file_url, chat_id, file_name, file_id):
+    # Dijalankan di worker antrean resi, sama seperti process_resi.
+    # file_url(file_id) mengembalikan URL unduhan dari Bot API.
+    stamp = int(time.time())
+    base_name = sanitize_filename(os.path.splitext(file_name)[0])
+
+    def send_part(part, number):
+        # File bagian ditutup setelah fungsi ini kembali, jadi tunggu uploadnya.
+        outbox.send_document(
+            chat_id,
+            part,
+            visible_file_name=f"resi_{base_name}_{stamp}_{number}.zip",
+            caption=f"📦 Resi massal bagian {number}"
+        ).result(timeout=SEND_RESULT_TIMEOUT)
+
+    try:
+        url = file_url(file_id)
+        try:
+            upload = download_upload(url)
+        except requests.RequestException:
+            # Pesan error requests memuat URL, dan URL file Telegram memuat
+            # token bot; jangan diteruskan ke pengguna maupun log.
+            raise BulkFileError("Gagal mengunduh file, silakan kirim ulang") from None
+        with upload:
+            summary = generate_bulk_resi(file_name, upload, send_part)
+    except BulkFileError as e:
+        outbox.send_message(chat_id, f"❌ {str(e)}")
+        return
+    except Exception as e:
+        outbox.send_message(chat_id, f"❌ Gagal membuat resi massal: {str(e)}")
+        raise
+
+    outbox.send_message(chat_id, format_bulk_summary(summary))
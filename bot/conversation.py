@@ -0,0 +1,66 @@
+import os
+from bot.session_backend import create_backend
+
+# Percakapan cetak resi yang ditinggalkan kedaluwarsa sendiri.
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "1800"))
+
+user_states = create_backend(
+    'conversation',
+    CONVERSATION_TTL,
+    int(os.getenv("CONVERSATION_MAX_ENTRIES", "50000"))
+)
+
+
+def start_resi(user_id):
+    # Lewat locked() supaya dengan backend SQLite langsung commit dan
+    # terlihat oleh proses lain yang menerima jawaban berikutnya.
+    with user_states.locked(user_id):
+        user_states.set(user_id, "waiting_for_name")
+
+
+def advance_conversation(user_id, text):
+    # Mengembalikan (teks balasan, tampilkan tombol kurir) untuk pengguna
+    # yang sedang mengisi data resi, atau None jika teks adalah pencarian.
+    with user_states.locked(user_id):
+        state = user_states.get(user_id)
+
+        if state == "waiting_for_name":
+            if len(text) < 3:
+                return "❌ Nama minimal 3 karakter", False
+            user_states.set(user_id, {"name": text, "state": "waiting_for_phone"})
+            return "📱 Masukkan nomor HP penerima:", False
+
+        elif isinstance(state, dict) and state.get("state") == "waiting_for_phone":
+            if not text.isdigit() or len(text) < 10:
+                return "❌ Nomor HP tidak valid", False
+            user_states.set(user_id, dict(state, phone=text, state="waiting_for_address"))
+            return "🏠 Masukkan alamat lengkap:", False
+
+        elif isinstance(state, dict) and state.get("state") == "waiting_for_address":
+            if len(text) < 10:
+                return "❌ Alamat terlalu pendek", False
+            user_states.set(user_id, dict(state, address=text, state="waiting_for_courier"))
+            return "🚚 Pilih jasa kirim:", True
+
+    return None
+
+
+def select_courier(user_id, courier):
+    with user_states.locked(user_id):
+        state = user_states.get(user_id)
+        if not isinstance(state, dict) or "state" not in state:
+            return False
+        user_states.set(user_id, dict(state, courier=courier, state="waiting_for_cod"))
+        return True
+
+
+def select_cod(user_id, cod_option):
+    # Mengembalikan salinan data resi yang lengkap; pembuatan dokumen
+    # dilakukan pemanggil di luar lock.
+    with user_states.locked(user_id):
+        state = user_states.get(user_id)
+        if not isinstance(state, dict) or "state" not in state:
+            return None
+        user_data = dict(state, cod=cod_option)
+        user_states.set(user_id, user_data)
+        return user_data
@@ -0,0 +1,265 @@
+from bot import metrics
+from bot.session_manager import SessionManager
+from bot.conversation import advance_conversation, select_courier, select_cod, start_resi, user_states
+from bot.bot_utils import (
+    search_address,
+    get_shipping_estimates,
+    create_detail_buttons,
+    create_back_button,
+    create_courier_buttons,
+    create_cod_buttons,
+    format_address_detail,
+    format_shipping_estimates,
+    validate_user,
+    search_cache,
+    shipping_breaker,
+    shipping_flight
+)
+from bot.shipping_cache import get_estimate_cache
+from bot.result_view import result_views, PAGE
+from bot.resi_jobs import get_resi_queue, process_resi, QueueFullError
+from bot.bulk_resi import is_bulk_file, process_bulk_resi, BULK_HELP
+
+# Logika handler yang dipakai bersama runtime TeleBot dan AsyncTeleBot.
+# Semua balasan lewat Outbox sehingga fungsi di sini tidak tahu runtime
+# mana yang memanggilnya. Fungsi yang membaca sesi/percakapan (bisa berupa
+# query SQLite), mencari alamat, atau memanggil Mengantar bersifat blocking;
+# runtime async menjalankannya di executor.
+
+WELCOME_TEXT = (
+    "🇮🇩 BOT PENCARIAN ALAMAT INDONESIA\n"
+    "Ketik nama wilayah yang ingin dicari:\n"
+    "Contoh: Bakongan atau 23773\n"
+    "Awalan kode pos juga bisa: 237\n"
+    "Gunakan filter spesifik:\n"
+    "kelurahan:Bakongan provinsi:Aceh\n"
+    "Atau kombinasi teks bebas dan filter:\n"
+    "Bakongan provinsi:Aceh\n"
+    "Resi massal dari file: /bulk"
+)
+STORE_COUNTERS = ('expired', 'evicted', 'flushed')
+
+session_manager = SessionManager()
+
+
+def register_metrics(outbox):
+    # Statistik yang sudah dikumpulkan komponen lain ikut diekspor di /metrics.
+    metrics.register_stats('search_cache', search_cache.stats, counters=('hits', 'misses'))
+    metrics.register_stats(
+        'estimate_cache', lambda: get_estimate_cache().stats(), counters=('hits', 'stale_hits', 'misses')
+    )
+    metrics.register_stats(
+        'mengantar_breaker', shipping_breaker.stats, counters=('successes', 'failures', 'rejected', 'opened')
+    )
+    metrics.register_stats('mengantar_flight', shipping_flight.stats, counters=('executed', 'shared'))
+    metrics.register_stats(
+        'send', outbox.scheduler.stats, counters=('sent', 'failed', 'coalesced', 'rate_limited')
+    )
+    metrics.register_stats(
+        'resi_queue', lambda: get_resi_queue().stats(), counters=('submitted', 'completed', 'failed', 'rejected')
+    )
+    metrics.register_stats('sessions', session_manager.sessions.stats, counters=STORE_COUNTERS)
+    metrics.register_stats('result_views', result_views.views.stats, counters=STORE_COUNTERS)
+    metrics.register_stats('conversations', user_states.stats, counters=STORE_COUNTERS)
+
+
+def _callback_user(outbox, call):
+    # user_id dari callback data "AKSI_<user_id>[_...]" setelah dicek
+    # milik pengirim callback; None (dan callback sudah dijawab) jika bukan.
+    if not validate_user(call):
+        outbox.answer_callback_query(call.id, "Unauthorized access")
+        return None
+    return int(call.data.split('_')[1])
+
+
+def _edit(outbox, call, text, markup):
+    outbox.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text=text,
+        reply_markup=markup,
+        parse_mode='HTML'
+    )
+
+
+def send_welcome(outbox, message):
+    outbox.send_message(message.chat.id, WELCOME_TEXT, parse_mode='HTML')
+
+
+def send_bulk_help(outbox, message):
+    outbox.send_message(message.chat.id, BULK_HELP)
+
+
+def handle_bulk_upload(outbox, message, file_url):
+    # file_url(file_id) dipanggil dari worker resi, bukan dari handler.
+    document = message.document
+    if not is_bulk_file(document.file_name):
+        outbox.reply_to(message, "❌ Format file tidak didukung, kirim .xlsx atau .csv")
+        return
+
+    try:
+        get_resi_queue().submit(
+            message.from_user.id, process_bulk_resi,
+            outbox, file_url,
+            message.chat.id, document.file_name, document.file_id
+        )
+    except QueueFullError:
+        outbox.reply_to(message, "⏳ Antrean resi sedang penuh, silakan coba lagi sebentar lagi")
+        return
+    outbox.reply_to(message, "⏳ File diterima, resi massal sedang diproses...")
+
+
+def handle_search(outbox, message):
+    user_id = message.from_user.id
+    query = message.text.strip()
+
+    # Teks bisa berupa jawaban percakapan cetak resi, bukan pencarian.
+    step = advance_conversation(user_id, query)
+    if step is not None:
+        reply_text, ask_courier = step
+        if ask_courier:
+            outbox.send_message(message.chat.id, reply_text, reply_markup=create_courier_buttons(user_id))
+        else:
+            outbox.reply_to(message, reply_text)
+        return
+
+    cursor = search_address(query)
+    if not cursor:
+        outbox.reply_to(message, "❌ Tidak ditemukan hasil untuk pencarian tersebut")
+        return
+
+    view = result_views.open(user_id, cursor)
+    session_manager.save_cursor(user_id, cursor, view.view_id)
+    text, markup = view.render(1)
+    outbox.send_message(message.chat.id, text, reply_markup=markup, parse_mode='HTML')
+
+
+def handle_courier_selection(outbox, call):
+    user_id = _callback_user(outbox, call)
+    if user_id is None:
+        return
+
+    courier = call.data.split('_')[2]
+    if not select_courier(user_id, courier):
+        outbox.answer_callback_query(call.id, "Sesi telah berakhir")
+        return
+
+    markup = create_cod_buttons(user_id)
+    outbox.send_message(call.message.chat.id, "COD Ongkir:", reply_markup=markup)
+    outbox.answer_callback_query(call.id)
+
+
+def handle_cod_selection(outbox, call):
+    user_id = _callback_user(outbox, call)
+    if user_id is None:
+        return
+
+    cod_option = call.data.split('_')[2]
+    user_data = select_cod(user_id, cod_option)
+    if user_data is None:
+        outbox.answer_callback_query(call.id, "Sesi telah berakhir")
+        return
+
+    if process_cetak_resi(outbox, call.message.chat.id, user_id, user_data):
+        outbox.answer_callback_query(call.id, "⏳ Resi sedang dibuat...")
+    else:
+        outbox.answer_callback_query(call.id)
+
+
+def handle_result_token(outbox, call):
+    resolved = result_views.resolve(call.data)
+    if resolved is None:
+        outbox.answer_callback_query(call.id, "Sesi telah berakhir")
+        return
+
+    view, action, arg = resolved
+    if call.from_user.id != view.user_id:
+        outbox.answer_callback_query(call.id, "Unauthorized access")
+        return
+
+    if action == PAGE:
+        text, markup = view.render(arg)
+        _edit(outbox, call, text, markup)
+        outbox.answer_callback_query(call.id)
+        return
+
+    selected = view.cursor[arg]
+    session_manager.save_selected_address(view.user_id, selected)
+    detail = format_address_detail(selected)
+    markup = create_detail_buttons(view.user_id)
+    outbox.send_message(call.message.chat.id, detail, reply_markup=markup, parse_mode='HTML')
+    outbox.answer_callback_query(call.id)
+
+
+def handle_cek_ongkir(outbox, call):
+    user_id = _callback_user(outbox, call)
+    if user_id is None:
+        return
+
+    selected_address = session_manager.get_selected_address(user_id)
+    if not selected_address:
+        outbox.answer_callback_query(call.id, "Alamat tidak tersedia")
+        return
+
+    # Callback langsung dijawab supaya tombol tidak berputar selama lookup
+    # Mengantar.
+    outbox.answer_callback_query(call.id)
+    estimates = get_shipping_estimates(selected_address['kode_pos'])
+    response_text = format_shipping_estimates(estimates)
+    markup = create_back_button(user_id)
+    outbox.send_message(call.message.chat.id, response_text, reply_markup=markup, parse_mode='HTML')
+
+
+def handle_back(outbox, call):
+    user_id = _callback_user(outbox, call)
+    if user_id is None:
+        return
+
+    view = result_views.get(session_manager.get_view_id(user_id))
+    if view is None:
+        outbox.answer_callback_query(call.id, "Sesi telah berakhir")
+        return
+
+    text, markup = view.render(1)
+    _edit(outbox, call, text, markup)
+    outbox.answer_callback_query(call.id)
+
+
+def handle_back_detail(outbox, call):
+    user_id = _callback_user(outbox, call)
+    if user_id is None:
+        return
+
+    selected_address = session_manager.get_selected_address(user_id)
+    if not selected_address:
+        outbox.answer_callback_query(call.id, "Alamat tidak tersedia")
+        return
+
+    _edit(outbox, call, format_address_detail(selected_address), create_detail_buttons(user_id))
+    outbox.answer_callback_query(call.id)
+
+
+def handle_cetak_resi(outbox, call):
+    user_id = _callback_user(outbox, call)
+    if user_id is None:
+        return
+
+    start_resi(user_id)
+    outbox.send_message(call.message.chat.id, "📱 Masukkan nama penerima:")
+    outbox.answer_callback_query(call.id)
+
+
+def process_cetak_resi(outbox, chat_id, user_id, user_data):
+    # Hanya mengantrekan pekerjaan; render dan upload dilakukan worker
+    # resi sehingga handler langsung kembali melayani update lain.
+    selected_address = session_manager.get_selected_address(user_id)
+    if not selected_address:
+        outbox.send_message(chat_id, "❌ Alamat tidak tersedia")
+        return False
+
+    try:
+        get_resi_queue().submit(user_id, process_resi, outbox, chat_id, user_data, selected_address)
+    except QueueFullError:
+        outbox.send_message(chat_id, "⏳ Antrean resi sedang penuh, silakan coba lagi sebentar lagi")
+        return False
+    return True
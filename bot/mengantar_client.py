@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bot import metrics
+
+BASE_URL = "https://app.mengantar.com"
+
+
+UPSTREAM_SECONDS = metrics.histogram(
+    'bot_mengantar_request_seconds', 'Lama request HTTP ke Mengantar (termasuk retry)', ('path', 'status')
+)
+
+
+class MengantarBusyError(requests.RequestException):
+    pass
+
+
+class MengantarClient:
+    def __init__(self, base_url=BASE_URL, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff=0.5, max_in_flight=8, acquire_timeout=None,
+                 retry_rate_limited=False, retry_after_max=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.acquire_timeout = read_timeout if acquire_timeout is None else acquire_timeout
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        # Di jalur interaktif 429 tidak diulang dan Retry-After diabaikan:
+        # header itu bisa meminta tidur berjam-jam sambil memegang slot
+        # in_flight. Biarkan circuit breaker yang menahan beban. Job offline
+        # (prefetch) boleh menunggu, tapi tetap dibatasi retry_after_max.
+        status_forcelist = (500, 502, 503, 504)
+        if retry_rate_limited:
+            status_forcelist = (429,) + status_forcelist
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=status_forcelist,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=retry_rate_limited,
+            retry_after_max=int(read_timeout if retry_after_max is None else retry_after_max),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            base_url=os.getenv("MENGANTAR_BASE_URL", BASE_URL),
+            connect_timeout=float(os.getenv("MENGANTAR_CONNECT_TIMEOUT", "3.05")),
+            read_timeout=float(os.getenv("MENGANTAR_READ_TIMEOUT", "10")),
+            retries=int(os.getenv("MENGANTAR_RETRIES", "2")),
+            backoff=float(os.getenv("MENGANTAR_BACKOFF", "0.5")),
+            max_in_flight=int(os.getenv("MENGANTAR_MAX_IN_FLIGHT", "8"))
+        )
+
+    def get(self, path, params=None):
+        # Batasi jumlah request yang berjalan bersamaan agar thread handler
+        # tidak menumpuk menunggu Mengantar yang sedang lambat.
+        if not self.in_flight.acquire(timeout=self.acquire_timeout):
+            raise MengantarBusyError("Terlalu banyak permintaan ke Mengantar")
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            status = str(response.status_code)
+            return response
+        finally:
+            self.in_flight.release()
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, path, status)
+
+    def autofill(self, keyword):
+        return self.get("/api/address/autofill", {"keyword": keyword})
+
+    def estimate(self, origin_id, destination_id, weight=1):
+        return self.get("/api/order/allEstimatePublic", {
+            "origin_id": origin_id,
+            "destination_id": destination_id,
+            "weight": weight
+        })
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MengantarClient.from_env()
+    return _client
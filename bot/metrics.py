@@ -0,0 +1,343 @@
+import cProfile
+import functools
+import heapq
+import inspect
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Metrik hanya aktif jika METRICS_PORT diset. Saat nonaktif, decorator
+# mengembalikan fungsi aslinya dan observe() langsung kembali, sehingga
+# jalur panas tidak membayar apa pun.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+ENABLED = METRICS_PORT > 0
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+_metrics = []
+_collectors = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        if not ENABLED:
+            return
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def expose(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # Hitungan per bucket (belum kumulatif), total, dan jumlah.
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        with self.lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self.series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+def _register(metric):
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def counter(name, help_text, labels=()):
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def register_stats(name, stats_fn, counters=()):
+    # Sumber berupa fungsi stats() yang sudah ada (cache, antrean, sesi...).
+    # Dibaca saat scrape; nama yang sama menggantikan pendaftaran lama.
+    # Key di `counters` adalah hitungan kumulatif dan diekspor sebagai
+    # counter (<nama>_total); sisanya gauge.
+    with _registry_lock:
+        _collectors[name] = (stats_fn, frozenset(counters))
+
+
+def _flatten(prefix, stats, counters, lines):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            _flatten(name, value, frozenset(), lines)
+        elif key in counters and isinstance(value, (int, float)):
+            lines.append(f"# TYPE {name}_total counter")
+            lines.append(f"{name}_total {_number(value)}")
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(int(value) if isinstance(value, bool) else value)}")
+        elif isinstance(value, str):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f'{name}{{value="{_escape(value)}"}} 1')
+
+
+def expose():
+    with _registry_lock:
+        metrics = list(_metrics)
+        collectors = sorted(_collectors.items())
+
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.expose())
+    for name, (stats_fn, counters) in collectors:
+        try:
+            stats = stats_fn()
+        except Exception as e:
+            print(f"Gagal membaca metrik {name}: {str(e)}")
+            continue
+        _flatten(f"bot_{name}", stats, counters, lines)
+    return '\n'.join(lines) + '\n'
+
+
+class SlowRequestProfiler:
+    # Sebagian request (sample_rate) dijalankan di bawah cProfile. Yang
+    # melebihi slow_ms disimpan sebagai file .prof; hanya `keep` request
+    # paling lambat yang dipertahankan, sisanya dihapus. Sejak Python 3.12
+    # hanya satu profiler boleh aktif per proses, jadi sampel diambil hanya
+    # jika tidak ada request lain yang sedang diprofil.
+    def __init__(self, sample_rate, slow_ms=500, keep=20, directory=PROFILE_DIR):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+        self.keep = keep
+        self.directory = directory
+        self.slowest = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.active = threading.Lock()
+
+    def call(self, name, fn, args, kwargs):
+        if random.random() >= self.sample_rate or not self.active.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Alat profiling lain (debugger, sys.monitoring) sedang aktif.
+                return fn(*args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                elapsed = time.perf_counter() - started
+                if elapsed >= self.slow_seconds:
+                    try:
+                        self._record(name, elapsed, profile)
+                    except Exception as e:
+                        print(f"Gagal menyimpan profil {name}: {str(e)}")
+        finally:
+            self.active.release()
+
+    def _record(self, name, elapsed, profile):
+        with self.lock:
+            if len(self.slowest) >= self.keep and elapsed <= self.slowest[0][0]:
+                return
+            seq = next(self.counter)
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{int(time.time())}_{seq}_{name}_{int(elapsed * 1000)}ms.prof")
+        stats = pstats.Stats(profile)
+        stats.dump_stats(path)
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats('cumulative').print_stats(15)
+        entry = {'name': name, 'seconds': elapsed, 'at': time.time(), 'path': path, 'summary': summary.getvalue()}
+
+        with self.lock:
+            heapq.heappush(self.slowest, (elapsed, seq, entry))
+            evicted = heapq.heappop(self.slowest) if len(self.slowest) > self.keep else None
+        if evicted is not None:
+            try:
+                os.remove(evicted[2]['path'])
+            except OSError:
+                pass
+
+    def report(self):
+        with self.lock:
+            entries = [entry for _, _, entry in sorted(self.slowest, reverse=True)]
+        if not entries:
+            return "Belum ada request lambat yang terekam\n"
+        parts = []
+        for entry in entries:
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['at']))
+            parts.append(f"== {entry['name']} {entry['seconds'] * 1000:.1f} ms @ {stamp} ({entry['path']})\n{entry['summary']}")
+        return '\n'.join(parts)
+
+
+profiler = SlowRequestProfiler(PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS, PROFILE_KEEP) if PROFILE_SAMPLE_RATE > 0 else None
+
+HANDLER_SECONDS = histogram('bot_handler_seconds', 'Lama eksekusi handler Telegram', ('handler',))
+HANDLER_ERRORS = counter('bot_handler_errors_total', 'Handler yang berakhir dengan exception', ('handler',))
+
+
+def instrument(fn):
+    # Dipasang di bawah decorator handler telebot. Handler async hanya diukur
+    # waktunya; cProfile tidak bisa mengikuti coroutine yang berpindah-pindah.
+    if not ENABLED and profiler is None:
+        return fn
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(name)
+                raise
+            finally:
+                HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                return profiler.call(name, fn, args, kwargs)
+            return fn(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+    return wrapper
+
+
+def timed(metric, *label_values):
+    if not ENABLED:
+        return lambda fn: fn
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - started, *label_values)
+        return wrapper
+    return decorator
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            body = expose()
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/debug/slow' and profiler is not None:
+            body = profiler.report()
+            content_type = 'text/plain; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(host=METRICS_HOST, port=METRICS_PORT):
+    # Default hanya mendengarkan di localhost; endpoint ini tidak berautentikasi.
+    global _server
+    if not ENABLED:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"Metrik tersedia di http://{host}:{port}/metrics")
+    return _server
@@ -0,0 +1,113 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bot.address_store import DATA_PATH, SNAPSHOT_PATH, load_store
+from bot.mengantar_client import BASE_URL, MengantarClient
+from bot.shipping_cache import DESTINATION_DB_PATH, DestinationCache
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def resolve_destination_id(client, kode_pos):
+    response = client.autofill(kode_pos)
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}")
+
+    data = response.json()
+    if data.get("success") and data.get("data"):
+        return data["data"][0]["_id"]
+    return None
+
+
+def prefetch(store, cache, client, concurrency=4, rate=5, batch_size=50):
+    # Kode pos yang sudah ada di tabel dilewati, jadi job bisa dihentikan
+    # dan dijalankan ulang kapan saja.
+    pending = [kode_pos for kode_pos in store.kode_pos_keys if kode_pos and kode_pos not in cache]
+    limiter = RateLimiter(rate)
+    stats = {'total': len(pending), 'resolved': 0, 'missing': 0, 'failed': 0}
+    batch = []
+
+    def task(kode_pos):
+        limiter.wait()
+        return resolve_destination_id(client, kode_pos)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(task, kode_pos): kode_pos for kode_pos in pending}
+        for future in as_completed(futures):
+            kode_pos = futures[future]
+            try:
+                destination_id = future.result()
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"Gagal {kode_pos}: {str(e)}")
+                continue
+
+            if destination_id is None:
+                stats['missing'] += 1
+                continue
+
+            stats['resolved'] += 1
+            batch.append((kode_pos, destination_id))
+            if len(batch) >= batch_size:
+                cache.put_many(batch)
+                batch = []
+                done = stats['resolved'] + stats['missing'] + stats['failed']
+                print(f"{done}/{stats['total']} kode pos diproses")
+
+    if batch:
+        cache.put_many(batch)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ambil destination_id Mengantar untuk semua kode pos")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH)
+    parser.add_argument('--db', default=os.getenv("DESTINATION_DB", DESTINATION_DB_PATH))
+    parser.add_argument('--base-url', default=os.getenv("MENGANTAR_BASE_URL", BASE_URL))
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=5, help="maksimum request per detik")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--retry-after-max', type=int, default=60,
+                        help="batas detik menunggu Retry-After dari Mengantar")
+    args = parser.parse_args(argv)
+
+    store = load_store(args.data, args.snapshot)
+    cache = DestinationCache(args.db)
+    client = MengantarClient(
+        base_url=args.base_url,
+        max_in_flight=args.concurrency,
+        retry_rate_limited=True,
+        retry_after_max=args.retry_after_max
+    )
+    try:
+        stats = prefetch(store, cache, client, args.concurrency, args.rate, args.batch_size)
+    finally:
+        cache.close()
+        client.close()
+
+    print(
+        f"Selesai: {stats['resolved']} ditemukan, {stats['missing']} tidak ditemukan, "
+        f"{stats['failed']} gagal dari {stats['total']} kode pos"
+    )
+
+
+if __name__ == '__main__':
+    main()
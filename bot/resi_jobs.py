@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from collections import deque
+from bot.resi_renderer import render_resi
+from bot.send_scheduler import SEND_RESULT_TIMEOUT
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _latency_stats(samples):
+    values = sorted(samples)
+    return {
+        'p50': _percentile(values, 0.5),
+        'p95': _percentile(values, 0.95),
+        'max': values[-1] if values else 0
+    }
+
+
+class JobQueue:
+    # Pekerjaan dikelompokkan per key (pengguna). Satu key hanya dikerjakan
+    # oleh satu worker pada satu waktu sehingga urutannya terjaga, sementara
+    # key lain tetap jalan paralel di worker yang tersisa.
+    def __init__(self, name, workers=4, max_pending=200, max_per_key=3, latency_window=1000):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_key = max_per_key
+        self.pending = {}
+        self.ready = deque()
+        self.active = set()
+        self.queued = 0
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.threads = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_times = deque(maxlen=latency_window)
+        self.run_times = deque(maxlen=latency_window)
+
+    def _start_workers(self):
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._work_loop, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, key, fn, *args):
+        with self.lock:
+            jobs = self.pending.get(key)
+            if self.queued >= self.max_pending or (jobs and len(jobs) >= self.max_per_key):
+                self.rejected += 1
+                raise QueueFullError(f"Antrean {self.name} penuh")
+
+            self._start_workers()
+            if jobs is None:
+                jobs = self.pending[key] = deque()
+                if key not in self.active:
+                    self.ready.append(key)
+            jobs.append((time.monotonic(), fn, args))
+            self.queued += 1
+            self.submitted += 1
+            self.available.notify()
+            return self.queued
+
+    def _take(self):
+        with self.lock:
+            while not self.ready:
+                self.available.wait()
+            key = self.ready.popleft()
+            jobs = self.pending[key]
+            job = jobs.popleft()
+            if not jobs:
+                del self.pending[key]
+            self.active.add(key)
+            self.queued -= 1
+            return key, job
+
+    def _work_loop(self):
+        while True:
+            key, (enqueued_at, fn, args) = self._take()
+            started_at = time.monotonic()
+            failed = False
+            try:
+                fn(*args)
+            except Exception as e:
+                failed = True
+                print(f"Job {self.name} untuk {key} gagal: {str(e)}")
+            finished_at = time.monotonic()
+
+            with self.lock:
+                self.active.discard(key)
+                if key in self.pending:
+                    self.ready.append(key)
+                    self.available.notify()
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self.wait_times.append(started_at - enqueued_at)
+                self.run_times.append(finished_at - started_at)
+
+    def stats(self):
+        with self.lock:
+            wait_times = list(self.wait_times)
+            run_times = list(self.run_times)
+            stats = {
+                'queued': self.queued,
+                'running': len(self.active),
+                'workers': len(self.threads),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+        stats['wait_seconds'] = _latency_stats(wait_times)
+        stats['run_seconds'] = _latency_stats(run_times)
+        return stats
+
+
+def process_resi(outbox, chat_id, user_data, selected_address):
+    # Dipanggil di worker; pesan gagal tetap dikirim ke pengguna lalu
+    # error diteruskan supaya tercatat di metrik antrean.
+    try:
+        file_name, document = render_resi(user_data, selected_address)
+    except FileNotFoundError:
+        outbox.send_message(chat_id, "❌ Template resi tidak ditemukan")
+        raise
+    except Exception as e:
+        outbox.send_message(chat_id, f"❌ Gagal membuat resi: {str(e)}")
+        raise
+
+    try:
+        # Tunggu upload selesai supaya pesan sukses/gagal menyusul dokumennya.
+        outbox.send_document(
+            chat_id,
+            document,
+            visible_file_name=file_name,
+            caption=f"📦 Resi untuk {user_data['name']}"
+        ).result(timeout=SEND_RESULT_TIMEOUT)
+        outbox.send_message(chat_id, "✅ Resi berhasil dikirim!")
+    except Exception as e:
+        outbox.send_message(chat_id, f"❌ Gagal membuat resi: {str(e)}")
+        raise
+
+
+_resi_queue = None
+_resi_queue_lock = threading.Lock()
+
+
+def get_resi_queue():
+    global _resi_queue
+    if _resi_queue is None:
+        with _resi_queue_lock:
+            if _resi_queue is None:
+                _resi_queue = JobQueue(
+                    'resi',
+                    workers=int(os.getenv("RESI_WORKERS", "4")),
+                    max_pending=int(os.getenv("RESI_QUEUE_MAX", "200")),
+                    max_per_key=int(os.getenv("RESI_QUEUE_PER_USER", "3"))
+                )
+    return _resi_queue
@@ -0,0 +1,161 @@
+import io
+import posixpath
+import re
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from openpyxl import load_workbook
+from bot import metrics
+from bot.bot_utils import sanitize_filename
+
+RESI_TEMPLATE_PATH = "data/label.xlsx"
+RESI_CELLS = ["D34", "D36", "D38", "D41", "B45", "B47"]
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+STYLE_ATTR = re.compile(r'\ss="(\d+)"')
+RENDER_SECONDS = metrics.histogram('bot_resi_render_seconds', 'Lama membuat satu file resi')
+
+
+def resi_cells(user_data, selected_address):
+    full_address = (
+        f"{user_data['address']}, "
+        f"{selected_address['kelurahan']}, "
+        f"{selected_address['kecamatan']}, "
+        f"{selected_address['kota']}, "
+        f"{selected_address['provinsi']}"
+    )
+    return {
+        "D34": user_data["name"],
+        "D36": user_data["phone"],
+        "D38": full_address,
+        "D41": selected_address['kode_pos'],
+        "B45": user_data["courier"],
+        "B47": "IYA" if user_data["cod"] == "YES" else "TIDAK",
+    }
+
+
+def _cell_xml(ref, style, value):
+    style_attr = f' s="{style}"' if style is not None else ''
+    if value is None:
+        return f'<c r="{ref}"{style_attr}/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+    text = escape(ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class ResiTemplate:
+    # label.xlsx diurai sekali. Sheet aktif dipecah menjadi potongan XML
+    # statis dan slot untuk sel yang diisi, sehingga membuat resi cukup
+    # menyambung string dan menulis zip baru ke memori.
+    def __init__(self, path=RESI_TEMPLATE_PATH, cells=RESI_CELLS):
+        with open(path, "rb") as f:
+            self.raw = f.read()
+
+        with zipfile.ZipFile(io.BytesIO(self.raw)) as archive:
+            self.members = [(info, archive.read(info)) for info in archive.infolist()]
+            self.sheet_name = self._active_sheet(archive)
+
+        sheet_xml = next(data for info, data in self.members if info.filename == self.sheet_name)
+        try:
+            self.pieces, self.slots = self._compile(sheet_xml.decode("utf-8"), cells)
+        except ValueError as e:
+            # Template dengan struktur tak terduga tetap bisa dipakai lewat
+            # openpyxl, hanya lebih lambat.
+            print(f"Template resi diisi lewat openpyxl: {str(e)}")
+            self.pieces = None
+
+    @staticmethod
+    def _active_sheet(archive):
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        view = workbook.find(f"{MAIN_NS}bookViews/{MAIN_NS}workbookView")
+        active = int(view.get("activeTab", 0)) if view is not None else 0
+        sheets = workbook.findall(f"{MAIN_NS}sheets/{MAIN_NS}sheet")
+        rel_id = sheets[active].get(f"{REL_NS}id")
+
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        for rel in rels.findall(f"{PKG_REL_NS}Relationship"):
+            if rel.get("Id") == rel_id:
+                target = rel.get("Target")
+                if target.startswith("/"):
+                    return target.lstrip("/")
+                return posixpath.normpath(posixpath.join("xl", target))
+        raise ValueError(f"Sheet {rel_id} tidak ditemukan di template")
+
+    @staticmethod
+    def _compile(sheet_xml, cells):
+        matches = []
+        for ref in cells:
+            match = re.search(rf'<c r="{ref}"([^>]*?)(?:/>|>.*?</c>)', sheet_xml, re.DOTALL)
+            if match is None:
+                raise ValueError(f"Sel {ref} tidak ada di template")
+            style = STYLE_ATTR.search(match.group(1))
+            matches.append((match.start(), match.end(), ref, style.group(1) if style else None))
+
+        pieces = []
+        slots = []
+        position = 0
+        for start, end, ref, style in sorted(matches):
+            pieces.append(sheet_xml[position:start])
+            slots.append((ref, style))
+            position = end
+        pieces.append(sheet_xml[position:])
+        return pieces, slots
+
+    @metrics.timed(RENDER_SECONDS)
+    def render(self, values):
+        if self.pieces is None:
+            return self.render_with_openpyxl(values)
+
+        parts = [self.pieces[0]]
+        for (ref, style), piece in zip(self.slots, self.pieces[1:]):
+            parts.append(_cell_xml(ref, style, values.get(ref)))
+            parts.append(piece)
+        sheet_xml = ''.join(parts).encode("utf-8")
+
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, "w") as archive:
+            for info, data in self.members:
+                # ZipInfo baru per resi; objek milik template tidak boleh
+                # dimutasi karena dipakai bersama oleh banyak thread.
+                member = zipfile.ZipInfo(info.filename, info.date_time)
+                member.compress_type = info.compress_type
+                member.external_attr = info.external_attr
+                archive.writestr(member, sheet_xml if info.filename == self.sheet_name else data)
+        output.seek(0)
+        return output
+
+    def render_with_openpyxl(self, values):
+        workbook = load_workbook(io.BytesIO(self.raw))
+        sheet = workbook.active
+        for ref, value in values.items():
+            sheet[ref] = ILLEGAL_XML_CHARS.sub('', value) if isinstance(value, str) else value
+        output = io.BytesIO()
+        workbook.save(output)
+        workbook.close()
+        output.seek(0)
+        return output
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_template():
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = ResiTemplate()
+    return _template
+
+
+def render_resi(user_data, selected_address):
+    template = get_template()
+    file_name = f"resi_{sanitize_filename(user_data['name'])}_{int(time.time())}.xlsx"
+    return file_name, template.render(resi_cells(user_data, selected_address))
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Permintaan identik yang datang bersamaan menunggu hasil dari satu
+    # panggilan yang sama, bukan memanggil upstream masing-masing.
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'executed': self.executed,
+                'shared': self.shared,
+                'in_flight': len(self.calls)
+            }
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, min_calls=10, window=20, reset_timeout=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self):
+        with self.lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+
+            if self.state == HALF_OPEN:
+                # Hanya satu panggilan percobaan sampai hasilnya diketahui.
+                if self.trial_in_flight:
+                    self.rejected += 1
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def is_open(self):
+        with self.lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self.lock:
+            self.successes += 1
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.trial_in_flight = False
+                self.outcomes.clear()
+                print(f"Circuit {self.name} ditutup kembali")
+            self.outcomes.append(True)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.outcomes.append(False)
+            if self.state == HALF_OPEN:
+                self._trip()
+                return
+
+            failed = self.outcomes.count(False)
+            if (self.state == CLOSED and len(self.outcomes) >= self.min_calls
+                    and failed / len(self.outcomes) >= self.failure_rate):
+                self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+        self.opened += 1
+        print(f"Circuit {self.name} dibuka: upstream sedang bermasalah")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'successes': self.successes,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'opened': self.opened,
+                'window_failures': self.outcomes.count(False),
+                'window_size': len(self.outcomes)
+            }
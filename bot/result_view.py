@@ -0,0 +1,143 @@
+import os
+import secrets
+import threading
+import weakref
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+from bot.bot_utils import ITEMS_PER_PAGE, format_results_message, search_address
+from bot.session_backend import create_backend
+from bot.state_store import StateStore
+
+# Callback data tombol hasil: "#" + ID view (8 karakter) + aksi + argumen
+# heksadesimal, misalnya "#Xb3k9QaZp1f". Jauh di bawah batas 64 byte
+# Telegram berapa pun jumlah hasilnya, dan tidak memuat user_id.
+TOKEN_PREFIX = '#'
+VIEW_ID_LENGTH = 8
+PAGE = 'p'
+SELECT = 's'
+ACTIONS = (PAGE, SELECT)
+
+VIEW_TTL = 300
+
+_page_texts = weakref.WeakKeyDictionary()
+_page_texts_lock = threading.Lock()
+
+
+def page_text(cursor, page):
+    # Teks halaman tidak bergantung pada pengguna, jadi di-memo per cursor.
+    # Cursor dibagi lewat cache pencarian sehingga pengguna lain dengan
+    # query yang sama ikut memakai hasil render ini.
+    with _page_texts_lock:
+        pages = _page_texts.get(cursor)
+        if pages is None:
+            pages = _page_texts[cursor] = {}
+        text = pages.get(page)
+    if text is None:
+        text = f"🔍 Ditemukan {len(cursor)} hasil:\n{format_results_message(cursor, page)}"
+        with _page_texts_lock:
+            pages[page] = text
+    return text
+
+
+class ResultView:
+    # Satu hasil pencarian seperti yang dilihat satu pengguna. Keyboard
+    # berisi token milik view ini dan di-memo per halaman.
+    def __init__(self, view_id, user_id, cursor):
+        self.view_id = view_id
+        self.user_id = user_id
+        self.cursor = cursor
+        self.keyboards = {}
+
+    def token(self, action, arg):
+        return f"{TOKEN_PREFIX}{self.view_id}{action}{arg:x}"
+
+    def keyboard(self, page):
+        markup = self.keyboards.get(page)
+        if markup is not None:
+            return markup
+
+        markup = InlineKeyboardMarkup()
+        start = (page-1) * ITEMS_PER_PAGE
+
+        row = []
+        for idx in range(max(0, min(ITEMS_PER_PAGE, len(self.cursor) - start))):
+            row.append(InlineKeyboardButton(str(start + idx + 1), callback_data=self.token(SELECT, start + idx)))
+        markup.row(*row)
+
+        nav_buttons = []
+        if page > 1:
+            nav_buttons.append(InlineKeyboardButton("⬅️ Sebelumnya", callback_data=self.token(PAGE, page - 1)))
+        if page < self.cursor.page_count(ITEMS_PER_PAGE):
+            nav_buttons.append(InlineKeyboardButton("Selanjutnya ➡️", callback_data=self.token(PAGE, page + 1)))
+        if nav_buttons:
+            markup.row(*nav_buttons)
+
+        self.keyboards[page] = markup
+        return markup
+
+    def render(self, page):
+        return page_text(self.cursor, page), self.keyboard(page)
+
+
+class ResultViews:
+    def __init__(self, ttl=VIEW_TTL, max_entries=None, backend=None):
+        if max_entries is None:
+            max_entries = int(os.getenv("SESSION_MAX_ENTRIES", "50000"))
+        self.views = create_backend('view', ttl, max_entries) if backend is None else backend
+        # Backend bersama hanya menyimpan pemilik dan query; objek view
+        # (beserta memo keyboard) tetap di-cache per proses.
+        self.local = StateStore(ttl=ttl, max_entries=max_entries) if self.views.serializes else None
+
+    def open(self, user_id, cursor):
+        view = ResultView(secrets.token_urlsafe(6), user_id, cursor)
+        if self.local is not None:
+            self.views.set(view.view_id, {'user_id': user_id, 'query': cursor.query})
+            self.local.set(view.view_id, view)
+        else:
+            self.views.set(view.view_id, view)
+        return view
+
+    def get(self, view_id):
+        if not view_id:
+            return None
+        if self.local is None:
+            return self.views.get(view_id)
+
+        view = self.local.get(view_id)
+        if view is None:
+            owner = self.views.get(view_id)
+            if owner is None:
+                return None
+            cursor = search_address(owner['query'])
+            if not cursor:
+                return None
+            view = ResultView(view_id, owner['user_id'], cursor)
+            self.local.set(view_id, view)
+        return view
+
+    def resolve(self, data):
+        # Mengembalikan (view, aksi, argumen) atau None jika token tidak
+        # dikenal atau sudah kedaluwarsa.
+        action_pos = len(TOKEN_PREFIX) + VIEW_ID_LENGTH
+        if not data.startswith(TOKEN_PREFIX) or len(data) <= action_pos + 1:
+            return None
+        action = data[action_pos]
+        if action not in ACTIONS:
+            return None
+        try:
+            arg = int(data[action_pos + 1:], 16)
+        except ValueError:
+            return None
+
+        view = self.get(data[len(TOKEN_PREFIX):action_pos])
+        if view is None:
+            return None
+        # Halaman dan keyboard di-memo per nomor halaman, jadi argumen di luar
+        # rentang dari klien yang dimodifikasi tidak boleh sampai ke render.
+        if action == PAGE and not 1 <= arg <= view.cursor.page_count(ITEMS_PER_PAGE):
+            return None
+        if action == SELECT and not 0 <= arg < len(view.cursor):
+            return None
+        return view, action, arg
+
+
+result_views = ResultViews()
@@ -0,0 +1,324 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from bot import metrics
+
+# Prioritas kiriman: angka kecil dikirim lebih dulu.
+ANSWER = 0
+MESSAGE = 1
+DOCUMENT = 2
+
+SEND_RESULT_TIMEOUT = float(os.getenv("SEND_RESULT_TIMEOUT", "300"))
+
+# Kunci blocked_until untuk jawaban callback (tanpa chat_id). Flood-wait
+# di answerCallbackQuery hanya menahan jawaban callback lain.
+CALLBACK_ANSWERS = 'callback_answers'
+SEND_SECONDS = metrics.histogram(
+    'bot_telegram_send_seconds', 'Lama panggilan Bot API Telegram', ('method', 'outcome')
+)
+
+
+def retry_after(error):
+    # TeleBot melempar telebot.apihelper.ApiTelegramException, AsyncTeleBot
+    # melempar telebot.asyncio_helper.ApiTelegramException; keduanya tidak
+    # saling mewarisi, jadi yang dicek cukup error_code-nya.
+    if getattr(error, 'error_code', None) == 429:
+        return (getattr(error, 'result_json', None) or {}).get('parameters', {}).get('retry_after', 1)
+    return None
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def wait_time(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Job:
+    __slots__ = ('priority', 'seq', 'chat_id', 'fn', 'args', 'kwargs', 'coalesce_key', 'future', 'attempts')
+
+    def __init__(self, priority, seq, chat_id, fn, args, kwargs, coalesce_key, future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.coalesce_key = coalesce_key
+        self.future = future
+        self.attempts = 0
+
+
+def _call(fn, args, kwargs):
+    return fn(*args, **kwargs)
+
+
+class SendScheduler:
+    # Satu thread dispatcher memilih kiriman berikutnya berdasarkan
+    # prioritas, token bucket global dan per chat, serta jeda 429. Pengiriman
+    # sendiri berjalan di pool sender, maksimal satu kiriman aktif per chat
+    # agar urutan pesan dalam satu chat terjaga. Thread handler tidak pernah
+    # menunggu atau tidur karena rate limit.
+    #
+    # Kiriman per chat disimpan di antrean FIFO masing-masing; heap hanya
+    # berisi kepala antrean tiap chat (plus jawaban callback), jadi antrean
+    # panjang satu chat tidak memperlambat pemilihan kiriman chat lain.
+    def __init__(self, execute=_call, global_rate=30, global_burst=30, chat_rate=1, chat_burst=5,
+                 workers=4, max_retries=5, idle_bucket_ttl=60):
+        self.execute = execute
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.idle_bucket_ttl = idle_bucket_ttl
+        self.heap = []
+        self.chat_queues = {}
+        self.queued = 0
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.global_bucket = TokenBucket(global_rate, global_burst, time.monotonic())
+        self.chat_buckets = {}
+        self.blocked_until = {}
+        self.in_flight = set()
+        self.coalescing = {}
+        self.senders = ThreadPoolExecutor(max_workers=workers)
+        self.thread = None
+        self.last_prune = time.monotonic()
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_env(cls, execute=_call):
+        return cls(
+            execute=execute,
+            global_rate=float(os.getenv("SEND_GLOBAL_RATE", "30")),
+            global_burst=float(os.getenv("SEND_GLOBAL_BURST", "30")),
+            chat_rate=float(os.getenv("SEND_CHAT_RATE", "1")),
+            chat_burst=float(os.getenv("SEND_CHAT_BURST", "5")),
+            workers=int(os.getenv("SEND_WORKERS", "4"))
+        )
+
+    def submit(self, priority, chat_id, fn, args=(), kwargs=None, coalesce_key=None):
+        kwargs = kwargs or {}
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+                self.thread.start()
+
+            if coalesce_key is not None:
+                # Edit yang belum terkirim untuk pesan yang sama cukup diganti
+                # isinya; hanya versi terakhir yang sampai ke Telegram.
+                pending = self.coalescing.get(coalesce_key)
+                if pending is not None:
+                    pending.args = args
+                    pending.kwargs = kwargs
+                    self.coalesced += 1
+                    return pending.future
+
+            job = _Job(priority, next(self.counter), chat_id, fn, args, kwargs, coalesce_key, Future())
+            self.queued += 1
+            if chat_id is None:
+                self._schedule(job)
+            else:
+                queue = self.chat_queues.get(chat_id)
+                if queue is None:
+                    queue = self.chat_queues[chat_id] = deque()
+                queue.append(job)
+                if len(queue) == 1 and chat_id not in self.in_flight:
+                    self._schedule(job)
+            if coalesce_key is not None:
+                self.coalescing[coalesce_key] = job
+            self.wakeup.notify()
+            return job.future
+
+    def _schedule(self, job):
+        heapq.heappush(self.heap, (job.priority, job.seq, job))
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    def _wait_time(self, job, now):
+        # 0 jika boleh dikirim sekarang, selain itu lama jeda dalam detik.
+        key = CALLBACK_ANSWERS if job.chat_id is None else job.chat_id
+        blocked = self.blocked_until.get(key, 0) - now
+        if blocked > 0:
+            return blocked
+        if job.chat_id is None:
+            return 0
+        return self._chat_bucket(job.chat_id, now).wait_time(now)
+
+    def _next_job(self, now):
+        deferred = []
+        timeout = None
+        job = None
+        global_wait = self.global_bucket.wait_time(now)
+        while self.heap:
+            item = heapq.heappop(self.heap)
+            candidate = item[2]
+            deferred.append(item)
+            # Jawaban callback (tanpa chat_id) tidak dihitung ke kuota pesan
+            # dan selalu berada di depan heap; begitu bertemu kiriman biasa
+            # saat kuota global habis, sisa antrean pasti ikut menunggu.
+            if candidate.chat_id is not None and global_wait > 0:
+                timeout = global_wait if timeout is None else min(timeout, global_wait)
+                break
+            wait = self._wait_time(candidate, now)
+            if wait == 0:
+                deferred.pop()
+                job = candidate
+                break
+            timeout = wait if timeout is None else min(timeout, wait)
+        for item in deferred:
+            heapq.heappush(self.heap, item)
+        return job, timeout
+
+    def _release(self, chat_id):
+        # Kiriman untuk chat ini selesai; kepala antrean berikutnya masuk heap.
+        self.in_flight.discard(chat_id)
+        queue = self.chat_queues.get(chat_id)
+        if queue:
+            self._schedule(queue[0])
+        self.wakeup.notify()
+
+    def _prune(self, now):
+        if now - self.last_prune < self.idle_bucket_ttl:
+            return
+        self.last_prune = now
+        for chat_id, bucket in list(self.chat_buckets.items()):
+            if now - bucket.updated > self.idle_bucket_ttl and chat_id not in self.in_flight:
+                del self.chat_buckets[chat_id]
+        for key, until in list(self.blocked_until.items()):
+            if until <= now:
+                del self.blocked_until[key]
+
+    def _dispatch_loop(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                job, timeout = self._next_job(now)
+                if job is None:
+                    self.wakeup.wait(timeout)
+                    continue
+
+                self.queued -= 1
+                if job.chat_id is not None:
+                    queue = self.chat_queues[job.chat_id]
+                    queue.popleft()
+                    if not queue:
+                        del self.chat_queues[job.chat_id]
+                    self.global_bucket.take()
+                    self.chat_buckets[job.chat_id].take()
+                    self.in_flight.add(job.chat_id)
+                if job.coalesce_key is not None and self.coalescing.get(job.coalesce_key) is job:
+                    del self.coalescing[job.coalesce_key]
+                self.senders.submit(self._send, job)
+
+    def _send(self, job):
+        if job.attempts:
+            # Dokumen berupa stream harus diputar ulang sebelum dikirim lagi.
+            for arg in itertools.chain(job.args, job.kwargs.values()):
+                if hasattr(arg, 'seek'):
+                    arg.seek(0)
+        method = getattr(job.fn, '__name__', 'call')
+        started = time.perf_counter()
+        try:
+            result = self.execute(job.fn, job.args, job.kwargs)
+        except Exception as e:
+            delay = retry_after(e)
+            SEND_SECONDS.observe(time.perf_counter() - started, method, 'error' if delay is None else 'rate_limited')
+            with self.lock:
+                if delay is not None and job.attempts < self.max_retries:
+                    # Jangan tidur di thread; tandai chat (atau jawaban
+                    # callback) dan kembalikan ke depan antreannya.
+                    job.attempts += 1
+                    self.rate_limited += 1
+                    self.queued += 1
+                    key = CALLBACK_ANSWERS if job.chat_id is None else job.chat_id
+                    self.blocked_until[key] = max(self.blocked_until.get(key, 0), time.monotonic() + delay)
+                    if job.chat_id is None:
+                        self._schedule(job)
+                        self.wakeup.notify()
+                    else:
+                        queue = self.chat_queues.get(job.chat_id)
+                        if queue is None:
+                            queue = self.chat_queues[job.chat_id] = deque()
+                        queue.appendleft(job)
+                        self._release(job.chat_id)
+                    return
+                self.failed += 1
+                self._release(job.chat_id)
+            print(f"Gagal mengirim ke Telegram: {str(e)}")
+            job.future.set_exception(e)
+            return
+
+        SEND_SECONDS.observe(time.perf_counter() - started, method, 'ok')
+        with self.lock:
+            self.sent += 1
+            self._release(job.chat_id)
+        job.future.set_result(result)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queued': self.queued,
+                'waiting_chats': len(self.chat_queues),
+                'in_flight': len(self.in_flight),
+                'sent': self.sent,
+                'failed': self.failed,
+                'coalesced': self.coalesced,
+                'rate_limited': self.rate_limited,
+                'blocked_chats': sum(1 for until in self.blocked_until.values() if until > time.monotonic())
+            }
+
+
+class Outbox:
+    # Pengganti pemanggilan bot.send_* langsung di handler. Setiap metode
+    # langsung mengembalikan Future; pemanggil yang butuh hasilnya (misalnya
+    # worker resi) menunggu Future tersebut.
+    def __init__(self, bot, scheduler):
+        self.bot = bot
+        self.scheduler = scheduler
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self.scheduler.submit(MESSAGE, chat_id, self.bot.send_message, (chat_id, text), kwargs)
+
+    def reply_to(self, message, text, **kwargs):
+        return self.scheduler.submit(MESSAGE, message.chat.id, self.bot.reply_to, (message, text), kwargs)
+
+    def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        return self.scheduler.submit(
+            MESSAGE, chat_id, self.bot.edit_message_text,
+            (text,), dict(kwargs, chat_id=chat_id, message_id=message_id),
+            coalesce_key=('edit', chat_id, message_id)
+        )
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        return self.scheduler.submit(ANSWER, None, self.bot.answer_callback_query, (callback_query_id, text), kwargs)
+
+    def send_document(self, chat_id, document, **kwargs):
+        return self.scheduler.submit(DOCUMENT, chat_id, self.bot.send_document, (chat_id, document), kwargs)
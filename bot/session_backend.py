@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from bot.state_store import StateStore
+
+SESSION_DB_PATH = 'data/sessions.sqlite3'
+
+
+class MemoryBackend(StateStore):
+    # Backend default: satu proses, nilai disimpan apa adanya.
+    serializes = False
+
+
+class SQLiteBackend:
+    # Backend bersama untuk beberapa proses bot di satu host. Nilai harus
+    # bisa di-JSON-kan; set() biasa dikumpulkan dan di-flush per batch, jadi
+    # baru terlihat proses lain setelah flush (maksimal flush_interval).
+    # Read-modify-write lewat locked() berjalan dalam satu transaksi
+    # BEGIN IMMEDIATE sehingga atomik antar proses dan langsung commit.
+    # self.lock hanya menjaga dict pending/flushing, tidak pernah dipegang
+    # selama I/O SQLite. Penulisan memakai satu koneksi (write_lock), bacaan
+    # memakai koneksi per thread sehingga tidak ikut menunggu lock tulis
+    # proses lain (WAL).
+    serializes = True
+
+    def __init__(self, path=SESSION_DB_PATH, namespace='session', ttl=300,
+                 flush_interval=0.05, cleanup_interval=60):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.cleanup_interval = cleanup_interval
+        self.pending = {}
+        self.flushing = {}
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.local = threading.local()
+        self.flushed = 0
+        self.last_cleanup = time.time()
+
+        self.conn = self._connect(check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires_at)")
+
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+
+    def _connect(self, check_same_thread=True):
+        return sqlite3.connect(self.path, timeout=5, check_same_thread=check_same_thread, isolation_level=None)
+
+    def _reader(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    def _in_transaction(self):
+        return getattr(self.local, 'transaction', False)
+
+    @contextmanager
+    def locked(self, key):
+        # Kunci tulis database berlaku lintas proses, jadi satu transaksi
+        # untuk semua key; stripe per key tidak diperlukan. Batch pending
+        # proses ini ikut ditulis agar terbaca di dalam transaksi.
+        if self._in_transaction():
+            yield
+            return
+        with self.write_lock:
+            with self.lock:
+                batch = self.pending
+                self.pending = {}
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.local.transaction = True
+                self._write(batch)
+                yield
+                self.conn.execute("COMMIT")
+            except BaseException:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                self._restore(batch)
+                raise
+            finally:
+                self.local.transaction = False
+            with self.lock:
+                self.flushed += len(batch)
+
+    def get(self, key):
+        key = str(key)
+        now = time.time()
+        if self._in_transaction():
+            # Baca lewat koneksi transaksi agar penulisan yang belum commit
+            # di transaksi ini ikut terlihat.
+            row = self.conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, now)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+
+        with self.lock:
+            # Nilai yang sedang ditulis (flushing) belum tentu sudah commit.
+            item = self.pending.get(key)
+            if item is None:
+                item = self.flushing.get(key)
+        if item is not None:
+            value, expires_at = item
+            if value is None or expires_at <= now:
+                return None
+            return json.loads(value)
+
+        row = self._reader().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, now)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        data = json.dumps(value, separators=(',', ':'))
+        self._put(str(key), (data, expires_at))
+
+    def delete(self, key):
+        self._put(str(key), (None, 0))
+
+    def _put(self, key, item):
+        if self._in_transaction():
+            # Nilai di transaksi ini lebih baru daripada yang masih tertunda.
+            with self.lock:
+                self.pending.pop(key, None)
+            self._write({key: item})
+            return
+        with self.lock:
+            self.pending[key] = item
+        if not self.flush_interval:
+            self.flush()
+
+    def _write(self, batch):
+        upserts = [
+            (self.namespace, key, value, expires_at)
+            for key, (value, expires_at) in batch.items() if value is not None
+        ]
+        deletes = [(self.namespace, key) for key, (value, _) in batch.items() if value is None]
+        self.conn.executemany("INSERT OR REPLACE INTO kv VALUES (?, ?, ?, ?)", upserts)
+        self.conn.executemany("DELETE FROM kv WHERE namespace = ? AND key = ?", deletes)
+
+    def _restore(self, batch):
+        # Kembalikan agar dicoba lagi pada flush berikutnya, kecuali sudah
+        # ada nilai yang lebih baru untuk key yang sama.
+        with self.lock:
+            for key, item in batch.items():
+                self.pending.setdefault(key, item)
+
+    def flush(self):
+        with self.write_lock:
+            with self.lock:
+                if not self.pending:
+                    return
+                batch = self.flushing = self.pending
+                self.pending = {}
+
+            try:
+                # BEGIN IMMEDIATE bisa gagal "database is locked" jika proses
+                # lain sedang menulis; batch tetap harus dikembalikan.
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._write(batch)
+                self.conn.execute("COMMIT")
+            except Exception:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                self._restore(batch)
+                with self.lock:
+                    self.flushing = {}
+                raise
+
+            with self.lock:
+                self.flushing = {}
+                self.flushed += len(batch)
+
+    def cleanup(self):
+        with self.write_lock:
+            self.conn.execute(
+                "DELETE FROM kv WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time())
+            )
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval or 1)
+            try:
+                self.flush()
+                if time.time() - self.last_cleanup >= self.cleanup_interval:
+                    self.last_cleanup = time.time()
+                    self.cleanup()
+            except sqlite3.Error as e:
+                print(f"Gagal menyimpan sesi ke {self.path}: {str(e)}")
+
+    def __len__(self):
+        row = self._reader().execute(
+            "SELECT COUNT(*) FROM kv WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time())
+        ).fetchone()
+        return row[0]
+
+    def stats(self):
+        with self.lock:
+            pending = len(self.pending)
+        return {
+            'size': len(self),
+            'pending': pending,
+            'flushed': self.flushed
+        }
+
+
+def create_backend(namespace, ttl, max_entries):
+    backend = os.getenv("SESSION_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteBackend(
+            path=os.getenv("SESSION_DB", SESSION_DB_PATH),
+            namespace=namespace,
+            ttl=ttl,
+            flush_interval=float(os.getenv("SESSION_FLUSH_INTERVAL", "0.05"))
+        )
+    if backend != "memory":
+        raise ValueError(f"SESSION_BACKEND tidak dikenal: {backend}")
+    return MemoryBackend(ttl=ttl, max_entries=max_entries)
@@ -1,47 +1,55 @@
-import time
-import threading
-from datetime import datetime, timedelta
+import os
+from bot.session_backend import create_backend
+from bot.bot_utils import search_address
+
+SESSION_TTL = 300
 
 class SessionManager:
-    def __init__(self):
-        self.sessions = {}
-        self.lock = threading.Lock()
-        self.cleanup_thread = threading.Thread(target=self._cleanup_sessions, daemon=True)
-        self.cleanup_thread.start()
-
-    def _cleanup_sessions(self):
-        while True:
-            time.sleep(300)
-            with self.lock:
-                current_time = datetime.now()
-                expired = [uid for uid, data in self.sessions.items() 
-                         if current_time - data['timestamp'] > timedelta(minutes=5)]
-                for uid in expired:
-                    del self.sessions[uid]
-
-    def save_results(self, user_id, results):
-        with self.lock:
-            self.sessions[user_id] = {
-                'results': results,
-                'timestamp': datetime.now()
-            }
-
-    def get_results(self, user_id):
-        with self.lock:
-            session = self.sessions.get(user_id)
-            if session and (datetime.now() - session['timestamp']) <= timedelta(minutes=5):
-                return session['results']
-            return None
+    def __init__(self, ttl=SESSION_TTL, max_sessions=None, backend=None):
+        if max_sessions is None:
+            max_sessions = int(os.getenv("SESSION_MAX_ENTRIES", "50000"))
+        self.sessions = create_backend('session', ttl, max_sessions) if backend is None else backend
+
+    def _encode_cursor(self, cursor):
+        # Backend persisten hanya menyimpan query; daftar baris dibangun
+        # ulang (biasanya dari cache pencarian) saat sesi dibaca.
+        if self.sessions.serializes:
+            return {'query': cursor.query}
+        return cursor
+
+    def _decode_cursor(self, cursor):
+        if isinstance(cursor, dict):
+            return search_address(cursor['query'])
+        return cursor
+
+    def save_cursor(self, user_id, cursor, view_id=None):
+        # Sesi baru harus langsung terlihat proses lain sebelum pengguna
+        # memilih hasil (save_selected_address membaca sesi ini).
+        with self.sessions.locked(user_id):
+            self.sessions.set(user_id, {'cursor': self._encode_cursor(cursor), 'view': view_id})
+
+    def get_cursor(self, user_id):
+        session = self.sessions.get(user_id)
+        if session:
+            return self._decode_cursor(session['cursor'])
+        return None
+
+    def get_view_id(self, user_id):
+        session = self.sessions.get(user_id)
+        if session:
+            return session.get('view')
+        return None
 
     def save_selected_address(self, user_id, address):
-        with self.lock:
-            if user_id in self.sessions:
-                self.sessions[user_id]['selected_address'] = address
-                self.sessions[user_id]['timestamp'] = datetime.now()
+        if self.sessions.serializes:
+            address = dict(address)
+        with self.sessions.locked(user_id):
+            session = self.sessions.get(user_id)
+            if session:
+                self.sessions.set(user_id, dict(session, selected_address=address))
 
     def get_selected_address(self, user_id):
-        with self.lock:
-            session = self.sessions.get(user_id)
-            if session and (datetime.now() - session['timestamp']) <= timedelta(minutes=5):
-                return session.get('selected_address')
-            return None
+        session = self.sessions.get(user_id)
+        if session:
+            return session.get('selected_address')
+        return None
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DESTINATION_DB_PATH = 'data/destinations.sqlite3'
+
+
+class DestinationCache:
+    # ID tujuan Mengantar praktis tidak pernah berubah, jadi disimpan tanpa
+    # kedaluwarsa di memori dan (opsional) di file SQLite lokal.
+    def __init__(self, path=None):
+        self.path = path
+        self.ids = {}
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS destinations ("
+                "kode_pos TEXT PRIMARY KEY, destination_id TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self.conn.commit()
+            for kode_pos, destination_id in self.conn.execute(
+                "SELECT kode_pos, destination_id FROM destinations"
+            ):
+                self.ids[kode_pos] = destination_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, kode_pos):
+        return str(kode_pos) in self.ids
+
+    def get(self, kode_pos):
+        return self.ids.get(str(kode_pos))
+
+    def put(self, kode_pos, destination_id):
+        self.put_many([(kode_pos, destination_id)])
+
+    def put_many(self, items):
+        items = [(str(kode_pos), destination_id) for kode_pos, destination_id in items]
+        with self.lock:
+            self.ids.update(items)
+            if self.conn is not None:
+                now = time.time()
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO destinations (kode_pos, destination_id, updated_at) VALUES (?, ?, ?)",
+                    [(kode_pos, destination_id, now) for kode_pos, destination_id in items]
+                )
+                self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+class EstimateCache:
+    # Estimasi ongkir dianggap segar selama ttl detik. Setelah itu nilai
+    # lama masih dikembalikan (sampai stale_ttl) sambil di-refresh di
+    # background.
+    def __init__(self, ttl=900, stale_ttl=86400, maxsize=4096):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value, True
+                if age <= self.stale_ttl:
+                    self.entries.move_to_end(key)
+                    self.stale_hits += 1
+                    return value, False
+                del self.entries[key]
+            self.misses += 1
+            return None, False
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def refresh(self, key, loader):
+        with self.lock:
+            if key in self.refreshing:
+                return False
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                value = loader()
+                if value is not None:
+                    self.put(key, value)
+            except Exception as e:
+                print(f"Gagal memperbarui cache ongkir: {str(e)}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'maxsize': self.maxsize
+            }
+
+
+_destination_cache = None
+_estimate_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_destination_cache():
+    global _destination_cache
+    if _destination_cache is None:
+        with _cache_lock:
+            if _destination_cache is None:
+                _destination_cache = DestinationCache(os.getenv("DESTINATION_DB", DESTINATION_DB_PATH) or None)
+    return _destination_cache
+
+
+def get_estimate_cache():
+    global _estimate_cache
+    if _estimate_cache is None:
+        with _cache_lock:
+            if _estimate_cache is None:
+                _estimate_cache = EstimateCache(
+                    ttl=float(os.getenv("ESTIMATE_CACHE_TTL", "900")),
+                    stale_ttl=float(os.getenv("ESTIMATE_CACHE_STALE_TTL", "86400"))
+                )
+    return _estimate_cache
@@ -0,0 +1,197 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+# Format snapshot (semua angka native-endian kecuali header):
+#   header  : magic, versi, byteorder, ukuran & mtime sumber JSON, jumlah section
+#   section : nama, offset, panjang -- isinya array uint32 atau blob UTF-8
+MAGIC = b'KDPS'
+VERSION = 2
+HEADER = struct.Struct('<4sHHqqI')
+SECTION = struct.Struct('<32sQQ')
+ALIGN = 8
+BYTEORDER = 1 if sys.byteorder == 'little' else 2
+
+VALUE_STR = 0
+VALUE_INT = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class ValueTable(Sequence):
+    __slots__ = ('kinds', 'offsets', 'data')
+
+    def __init__(self, kinds, offsets, data):
+        self.kinds = kinds
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, idx):
+        kind = self.kinds[idx]
+        text = str(self.data[self.offsets[idx]:self.offsets[idx + 1]], 'utf-8')
+        return int(text) if kind == VALUE_INT else text
+
+    def __len__(self):
+        return len(self.kinds)
+
+
+def _source_stamp(source_path):
+    try:
+        stat = os.stat(source_path)
+    except OSError:
+        return -1, -1
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _pack_strings(strings):
+    offsets = array('I', [0])
+    data = bytearray()
+    for text in strings:
+        data += text.encode('utf-8')
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+def _unpack_strings(offsets, data):
+    return [str(data[offsets[i]:offsets[i + 1]], 'utf-8') for i in range(len(offsets) - 1)]
+
+
+def _pack_index(name, index):
+    tokens = sorted(index)
+    key_offsets, key_data = _pack_strings(tokens)
+    post_offsets = array('I', [0])
+    post_data = array('I')
+    for token in tokens:
+        post_data.extend(index[token])
+        post_offsets.append(len(post_data))
+    return [
+        (f'{name}.keys.off', key_offsets),
+        (f'{name}.keys.data', key_data),
+        (f'{name}.post.off', post_offsets),
+        (f'{name}.post.data', post_data),
+    ]
+
+
+def _unpack_index(sections, name):
+    tokens = _unpack_strings(sections[f'{name}.keys.off'].cast('I'), sections[f'{name}.keys.data'])
+    post_offsets = sections[f'{name}.post.off'].cast('I')
+    post_data = sections[f'{name}.post.data'].cast('I')
+    return {
+        token: post_data[post_offsets[i]:post_offsets[i + 1]]
+        for i, token in enumerate(tokens)
+    }
+
+
+def write_snapshot(snapshot_path, source_path, parts):
+    values = parts['values']
+    kinds = array('B')
+    texts = []
+    for value in values:
+        kinds.append(VALUE_INT if isinstance(value, int) else VALUE_STR)
+        texts.append(str(value))
+    value_offsets, value_data = _pack_strings(texts)
+
+    sections = [
+        ('values.kind', kinds),
+        ('values.off', value_offsets),
+        ('values.data', value_data),
+    ]
+    for field, column in parts['columns'].items():
+        sections.append((f'col.{field}', array('I', column)))
+    for field, index in parts['field_index'].items():
+        sections.extend(_pack_index(f'field.{field}', index))
+    sections.extend(_pack_index('text', parts['text_index']))
+    sections.extend(_pack_index('kode_pos', parts['kode_pos_index']))
+
+    source_size, source_mtime = _source_stamp(source_path)
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    blobs = []
+    for name, payload in sections:
+        blob = payload.tobytes() if isinstance(payload, array) else bytes(payload)
+        offset += -offset % ALIGN
+        table.append(SECTION.pack(name.encode('ascii'), offset, len(blob)))
+        blobs.append((offset, blob))
+        offset += len(blob)
+
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTEORDER, source_size, source_mtime, len(sections)))
+        f.write(b''.join(table))
+        for blob_offset, blob in blobs:
+            f.write(b'\0' * (blob_offset - f.tell()))
+            f.write(blob)
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_snapshot(snapshot_path, source_path):
+    with open(snapshot_path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            raise SnapshotError(f"snapshot kosong: {str(e)}")
+
+    view = memoryview(mapped)
+    if len(view) < HEADER.size:
+        raise SnapshotError("header snapshot tidak lengkap")
+
+    magic, version, byteorder, source_size, source_mtime, count = HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION or byteorder != BYTEORDER:
+        raise SnapshotError(f"format snapshot tidak dikenal (versi {version})")
+
+    current_stamp = _source_stamp(source_path)
+    if current_stamp != (-1, -1) and current_stamp != (source_size, source_mtime):
+        raise SnapshotError(f"snapshot lebih lama dari {source_path}")
+
+    sections = {}
+    for i in range(count):
+        name, offset, length = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+        if offset + length > len(view):
+            raise SnapshotError("section snapshot terpotong")
+        sections[name.rstrip(b'\0').decode('ascii')] = view[offset:offset + length]
+
+    try:
+        columns = {
+            name[len('col.'):]: section.cast('I')
+            for name, section in sections.items() if name.startswith('col.')
+        }
+        field_index = {
+            name[len('field.'):-len('.keys.off')]: _unpack_index(sections, name[:-len('.keys.off')])
+            for name in sections if name.startswith('field.') and name.endswith('.keys.off')
+        }
+        return {
+            'values': ValueTable(
+                sections['values.kind'],
+                sections['values.off'].cast('I'),
+                sections['values.data']
+            ),
+            'columns': columns,
+            'field_index': field_index,
+            'text_index': _unpack_index(sections, 'text'),
+            'kode_pos_index': _unpack_index(sections, 'kode_pos'),
+        }
+    except (KeyError, TypeError) as e:
+        raise SnapshotError(f"snapshot rusak: {str(e)}")
+
+
+def main(argv=None):
+    from bot.address_store import AddressStore, DATA_PATH, SNAPSHOT_PATH
+
+    parser = argparse.ArgumentParser(description="Kompilasi kodepos.json menjadi snapshot biner")
+    parser.add_argument('source', nargs='?', default=DATA_PATH)
+    parser.add_argument('output', nargs='?', default=SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    store = AddressStore.load(args.source)
+    store.save_snapshot(args.output, args.source)
+    print(f"Snapshot {args.output} dibuat: {len(store)} entri")
+
+
+if __name__ == '__main__':
+    main()
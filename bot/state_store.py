@@ -0,0 +1,101 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class StateStore:
+    # Lock struktur (self.lock) hanya dipegang untuk operasi dict/heap yang
+    # singkat. Read-modify-write per pengguna memakai lock stripe lewat
+    # locked(key), sehingga pengguna lain tidak ikut menunggu.
+    def __init__(self, ttl=300, max_entries=100000, stripes=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.heap = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.stripes = [threading.Lock() for _ in range(stripes)]
+        self.expired = 0
+        self.evicted = 0
+        self.expiry_thread = None
+
+    def _start_expiry(self):
+        if self.expiry_thread is None:
+            self.expiry_thread = threading.Thread(target=self._expire_loop, daemon=True)
+            self.expiry_thread.start()
+
+    @contextmanager
+    def locked(self, key):
+        stripe = self.stripes[hash(key) % len(self.stripes)]
+        with stripe:
+            yield
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.entries[key]
+                self.expired += 1
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self._start_expiry()
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            heapq.heappush(self.heap, (expires_at, next(self.counter), key))
+            if self.heap[0][0] == expires_at:
+                self.wakeup.notify()
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evicted += 1
+
+            # Entri heap lama (karena key di-set ulang) dibuang saat jatuh
+            # tempo; bangun ulang heap jika jumlahnya terlalu menumpuk.
+            if len(self.heap) > 2 * len(self.entries) + 1024:
+                self.heap = [
+                    (entry[1], next(self.counter), entry_key)
+                    for entry_key, entry in self.entries.items()
+                ]
+                heapq.heapify(self.heap)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def _expire_loop(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                while self.heap and self.heap[0][0] <= now:
+                    expires_at, _, key = heapq.heappop(self.heap)
+                    entry = self.entries.get(key)
+                    if entry is not None and entry[1] == expires_at:
+                        del self.entries[key]
+                        self.expired += 1
+
+                timeout = self.heap[0][0] - now if self.heap else None
+                self.wakeup.wait(timeout)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
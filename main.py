@@ -1,13 +1,35 @@
 from dotenv import load_dotenv
+import argparse
 import os
-from bot.bot_handlers import start_bot
 
+# Muat .env sebelum modul bot diimpor karena konfigurasinya dibaca saat import.
 load_dotenv()
 
+from bot.bot_handlers import start_bot
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bot pencarian alamat Indonesia")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="jalankan dengan AsyncTeleBot (polling atau webhook)")
+    parser.add_argument("--webhook-url", default=os.getenv("WEBHOOK_URL"),
+                        help="URL publik webhook; tanpa ini mode async memakai polling")
+    parser.add_argument("--listen", default=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WEBHOOK_PORT", "8080")))
+    args = parser.parse_args()
+
     TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     if not TOKEN:
         raise ValueError("Telegram bot token tidak ditemukan di file .env")
     
     print("Memulai bot...")
-    start_bot(TOKEN)
+    if args.use_async:
+        from bot.async_handlers import start_async_bot
+        start_async_bot(
+            TOKEN,
+            webhook_url=args.webhook_url,
+            listen=args.listen,
+            port=args.port,
+            secret_token=os.getenv("WEBHOOK_SECRET")
+        )
+    else:
+        start_bot(TOKEN)
@@ -0,0 +1,67 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StubServer:
+    # Server HTTP lokal untuk test. Respons tiap path diatur lewat route():
+    # fungsi (query) -> (status, body, headers) atau tuple tetap. Setiap
+    # request dicatat di self.requests.
+    def __init__(self):
+        stub = self
+        self.routes = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with stub.lock:
+                    stub.requests.append((url.path, query))
+                route = stub.routes.get(url.path)
+                if route is None:
+                    status, body, headers = 404, {}, {}
+                else:
+                    status, body, headers = route(query) if callable(route) else route
+                data = json.dumps(body).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def route(self, path, response):
+        self.routes[path] = response
+
+    def delayed(self, seconds, response):
+        def handler(query):
+            time.sleep(seconds)
+            return response
+        return handler
+
+    def count(self, path):
+        with self.lock:
+            return sum(1 for request_path, _ in self.requests if request_path == path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,151 @@
+import pytest
+
+from bot.address_store import AddressStore
+from bot.benchmark import generate_entries, generate_queries
+
+ENTRIES = [
+    {"kelurahan": "Pasar 3", "kecamatan": "Medan Kota", "kota": "Kota Medan", "provinsi": "Sumatera Utara",
+     "kode_pos": "20212", "kode_kemendagri": "12.71.01.1001"},
+    {"kelurahan": "2 Ilir", "kecamatan": "Ilir Timur II", "kota": "Kota Palembang", "provinsi": "Sumatera Selatan",
+     "kode_pos": "30118", "kode_kemendagri": "16.71.05.1001"},
+    {"kelurahan": "1 Ulu", "kecamatan": "Seberang Ulu I", "kota": "Kota Palembang", "provinsi": "Sumatera Selatan",
+     "kode_pos": "30257", "kode_kemendagri": "16.71.03.1001"},
+    {"kelurahan": "Bakongan", "kecamatan": "Bakongan", "kota": "Kab. Aceh Selatan", "provinsi": "Aceh",
+     "kode_pos": "23773", "kode_kemendagri": "11.01.01.2001"},
+    {"kelurahan": "Keude Bakongan", "kecamatan": "Bakongan", "kota": "Kab. Aceh Selatan", "provinsi": "Aceh",
+     "kode_pos": "23773", "kode_kemendagri": "11.01.01.2002"},
+    {"kelurahan": "Ujong Mangki", "kecamatan": "Bakongan Timur", "kota": "Kab. Aceh Selatan", "provinsi": "Aceh",
+     "kode_pos": "23774", "kode_kemendagri": "11.01.02.2001"},
+    {"kelurahan": "Gambir", "kecamatan": "Gambir", "kota": "Kota Jakarta Pusat", "provinsi": "DKI Jakarta",
+     "kode_pos": 10110, "kode_kemendagri": "31.73.01.1001"},
+]
+
+QUERIES = [
+    "", "   ", "bakongan", "BAKONGAN", "Bakongan Aceh", "aceh bakongan", "kong", "ongan selatan",
+    "Pasar 3", "2 Ilir", "ilir 2", "1 Ulu", "ulu", "kota:palembang", "KOTA:Palembang ilir",
+    "kelurahan:bakongan", "kelurahan:bakongan provinsi:aceh", "kecamatan:bakongan timur",
+    "kelurahan:", "provinsi: aceh", "foo:bar", "foo:bar gambir", "kode_pos:23773", "kode_pos:2377",
+    "kode_pos:10110", "kode_pos:23773 kelurahan:keude", "tidakada", "bakongan tidakada",
+]
+
+
+def baseline_search(entries, query):
+    # Pemindaian linear search_address sebelum ada indeks (baseline), plus
+    # satu aturan baru: query yang seluruhnya angka adalah awalan kode pos.
+    parts = query.split()
+    if parts and all(part.isascii() and part.isdigit() for part in parts):
+        results = [entry for entry in entries if all(str(entry['kode_pos']).startswith(p) for p in parts)]
+        return sorted(results, key=lambda x: (x['provinsi'], x['kota'], x['kecamatan'], x['kelurahan']))
+
+    filters = {}
+    general_terms = []
+    for part in parts:
+        if ':' in part:
+            key, value = part.split(':', 1)
+            filters[key.lower().strip()] = value.strip().lower()
+        else:
+            general_terms.append(part.strip().lower())
+
+    results = []
+    for entry in entries:
+        match = True
+        for field in ['kelurahan', 'kecamatan', 'kota', 'provinsi', 'kode_pos']:
+            if field in filters:
+                entry_value = str(entry.get(field, '')).lower()
+                filter_value = filters[field]
+                if field == 'kode_pos':
+                    if entry_value != filter_value:
+                        match = False
+                        break
+                elif filter_value not in entry_value:
+                    match = False
+                    break
+
+        if match and general_terms:
+            searchable = ' '.join([
+                str(entry['kelurahan']),
+                str(entry['kecamatan']),
+                str(entry['kota']),
+                str(entry['provinsi'])
+            ]).lower()
+            if not all(term in searchable for term in general_terms):
+                match = False
+
+        if match:
+            results.append(entry)
+
+    return sorted(results, key=lambda x: (x['provinsi'], x['kota'], x['kecamatan'], x['kelurahan']))
+
+
+def rows(cursor):
+    return [dict(record) for record in cursor]
+
+
+@pytest.fixture(scope='module')
+def store():
+    return AddressStore.from_entries(ENTRIES)
+
+
+@pytest.fixture(scope='module')
+def synthetic():
+    entries = generate_entries(3000, seed=7)
+    return entries, AddressStore.from_entries(entries)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_search_matches_baseline_scan(store, query):
+    assert rows(store.search(query)) == baseline_search(ENTRIES, query)
+
+
+def test_search_matches_baseline_on_synthetic_data(synthetic):
+    entries, store = synthetic
+    for query in generate_queries(entries, 300, seed=7):
+        assert rows(store.search(query)) == baseline_search(entries, query), query
+
+
+def test_free_text_terms_must_all_match(store):
+    assert [r['kelurahan'] for r in store.search("bakongan keude")] == ["Keude Bakongan"]
+    assert len(store.search("bakongan")) == 3
+    assert len(store.search("bakongan palembang")) == 0
+
+
+def test_filters_are_substring_and_kode_pos_is_exact(store):
+    assert [r['kelurahan'] for r in store.search("kecamatan:ilir")] == ["2 Ilir"]
+    assert len(store.search("kode_pos:2377")) == 0
+    assert len(store.search("kode_pos:23773")) == 2
+    assert len(store.search("foo:bar")) == len(ENTRIES)
+    assert len(store.search("kelurahan:")) == len(ENTRIES)
+
+
+def test_all_digit_query_is_postal_prefix(store):
+    assert [r['kelurahan'] for r in store.search("23773")] == ["Bakongan", "Keude Bakongan"]
+    assert [r['kelurahan'] for r in store.search("2377")] == ["Bakongan", "Keude Bakongan", "Ujong Mangki"]
+    assert [r['kelurahan'] for r in store.search("301")] == ["2 Ilir"]
+    assert [r['kelurahan'] for r in store.search("101")] == ["Gambir"]
+    assert len(store.search("99")) == 0
+
+
+def test_digits_inside_free_text_stay_text_terms(store):
+    assert [r['kelurahan'] for r in store.search("Pasar 3")] == ["Pasar 3"]
+    assert [r['kelurahan'] for r in store.search("2 Ilir")] == ["2 Ilir"]
+    assert len(store.search("bakongan 23773")) == 0
+
+
+def canonical(record):
+    return record['provinsi'], record['kota'], record['kecamatan'], record['kelurahan']
+
+
+def test_results_are_in_canonical_order(synthetic):
+    entries, store = synthetic
+    for query in ["a", "an", "kab", "ja provinsi:jawa", "2"]:
+        found = rows(store.search(query))
+        assert found
+        assert found == sorted(found, key=canonical)
+
+
+@pytest.mark.parametrize('limit', [1, 5, 37, 10000])
+def test_limit_is_prefix_of_unlimited_result(synthetic, limit):
+    entries, store = synthetic
+    for query in ["", "a", "ba sa", "kota:kab", "kelurahan:a provinsi:a", "2", "kode_pos:20000"]:
+        unlimited = rows(store.search(query))
+        assert rows(store.search(query, limit)) == unlimited[:limit]
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from bot import handlers
+from bot.async_handlers import create_async_bot
+
+BLOCKING = [
+    'handle_search',
+    'handle_courier_selection',
+    'handle_cod_selection',
+    'handle_result_token',
+    'handle_cek_ongkir',
+    'handle_back',
+    'handle_back_detail',
+    'handle_cetak_resi'
+]
+
+
+def registered(bot):
+    functions = {}
+    for handler in bot.message_handlers + bot.callback_query_handlers:
+        functions[handler['function'].__name__] = handler['function']
+    return functions
+
+
+@pytest.mark.parametrize('name', BLOCKING)
+def test_blocking_handlers_run_off_the_event_loop(monkeypatch, name):
+    threads = []
+    monkeypatch.setattr(handlers, name, lambda outbox, update: threads.append(threading.current_thread()))
+    bot, _ = create_async_bot('1:test')
+    update = SimpleNamespace(data='X_1', text='x')
+
+    async def run():
+        await registered(bot)[name](update)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert len(threads) == 1
+    assert threads[0] is not loop_thread
@@ -0,0 +1,212 @@
+import csv
+import io
+import os
+import zipfile
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from bot import address_store, resi_renderer
+from bot.address_store import AddressStore, set_store
+from bot.bulk_resi import BulkFileError, _pick_address, generate_bulk_resi, iter_rows, validate_row
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'label.xlsx')
+
+ENTRIES = [
+    {"kelurahan": "Bakongan", "kecamatan": "Bakongan", "kota": "Kab. Aceh Selatan", "provinsi": "Aceh",
+     "kode_pos": "23773", "kode_kemendagri": "11.01.01.2001"},
+    {"kelurahan": "Keude Bakongan", "kecamatan": "Bakongan", "kota": "Kab. Aceh Selatan", "provinsi": "Aceh",
+     "kode_pos": "23773", "kode_kemendagri": "11.01.01.2002"},
+    {"kelurahan": "Gambir", "kecamatan": "Gambir", "kota": "Kota Jakarta Pusat", "provinsi": "DKI Jakarta",
+     "kode_pos": "10110", "kode_kemendagri": "31.73.01.1001"},
+]
+
+CSV_ROWS = [
+    "Nama Penerima;No HP;Alamat Lengkap;Kodepos;Jasa Kirim;COD;Kelurahan",
+    "Budi Santoso;+62 812-3456-7890;Jl. Merdeka No. 5 RT 01;10110;jne;ya;",
+    "An;081234567890;Jl. Merdeka No. 6 RT 01;10110;JNE;tidak;",
+    "Citra Dewi;081234567891;Jl. Kenanga No. 1 Desa;23773;j&t;;",
+    ";;;;;;",
+    "Dodi Pratama;8123456789;Jl. Kenanga No. 2 Desa;23773;lion parcel;no;keude bakongan",
+    "Eka Putra;081234567892;Jl. Kenanga No. 3 Desa;99999;SiCepat;ya;",
+]
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    previous = address_store._store
+    set_store(AddressStore.from_entries(ENTRIES))
+    monkeypatch.setattr(resi_renderer, '_template', resi_renderer.ResiTemplate(TEMPLATE_PATH))
+    yield
+    set_store(previous)
+
+
+def csv_stream(lines):
+    return io.BytesIO(('﻿' + '\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def xlsx_stream(rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def collect_parts():
+    parts = []
+
+    def on_part(part, number):
+        parts.append((number, part.read()))
+    return parts, on_part
+
+
+def zip_names(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return archive.namelist()
+
+
+def test_csv_semicolon_and_header_aliases():
+    rows = list(iter_rows('data.csv', csv_stream(CSV_ROWS)))
+    assert [number for number, _ in rows] == [2, 3, 4, 6, 7]
+    number, row = rows[0]
+    assert row['nama'] == 'Budi Santoso'
+    assert row['hp'] == '+62 812-3456-7890'
+    assert row['kode_pos'] == '10110'
+    assert row['kurir'] == 'jne'
+
+
+def test_xlsx_numbers_become_text():
+    stream = xlsx_stream([
+        ["nama", "phone", "alamat", "kode_pos", "courier", "cod"],
+        ["Budi Santoso", 81234567890, "Jl. Merdeka No. 5", 10110.0, "JNE", None],
+    ])
+    assert list(iter_rows('data.xlsx', stream)) == [(2, {
+        'nama': 'Budi Santoso', 'hp': '81234567890', 'alamat': 'Jl. Merdeka No. 5',
+        'kode_pos': '10110', 'kurir': 'JNE', 'cod': ''
+    })]
+
+
+@pytest.mark.parametrize('file_name, data, message', [
+    ('data.csv', b'', 'File kosong'),
+    ('data.csv', b'nama,hp,alamat\n', 'Kolom wajib tidak ada: kode_pos, kurir'),
+    ('data.xlsx', b'bukan zip', 'File tidak bisa dibaca'),
+    ('data.txt', b'nama', 'Format file tidak didukung'),
+])
+def test_unreadable_files_raise_bulk_file_error(file_name, data, message):
+    with pytest.raises(BulkFileError, match=message):
+        list(iter_rows(file_name, io.BytesIO(data)))
+
+
+@pytest.mark.parametrize('phone, expected', [
+    ('+62 812-3456-7890', '081234567890'),
+    ('8123456789', '08123456789'),
+    ('0812 3456 7890', '081234567890'),
+])
+def test_validate_row_normalizes_phone(phone, expected):
+    row = {'nama': 'Budi', 'hp': phone, 'alamat': 'Jl. Merdeka No. 5', 'kode_pos': '10110', 'kurir': 'j&t'}
+    user_data, kode_pos = validate_row(row)
+    assert user_data == {
+        'name': 'Budi', 'phone': expected, 'address': 'Jl. Merdeka No. 5', 'courier': 'J&T', 'cod': 'NO'
+    }
+    assert kode_pos == '10110'
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'nama': 'Bu'}, 'Nama minimal 3 karakter'),
+    ({'hp': '0812'}, 'Nomor HP tidak valid'),
+    ({'alamat': 'Jl. A'}, 'Alamat terlalu pendek'),
+    ({'kode_pos': '101-10'}, 'Kode pos tidak valid'),
+    ({'kurir': 'Pos'}, 'Kurir tidak dikenal'),
+    ({'cod': 'mungkin'}, 'Nilai COD tidak valid'),
+])
+def test_validate_row_rejects(change, message):
+    row = {'nama': 'Budi', 'hp': '081234567890', 'alamat': 'Jl. Merdeka No. 5', 'kode_pos': '10110', 'kurir': 'JNE'}
+    with pytest.raises(ValueError, match=message):
+        validate_row(dict(row, **change))
+
+
+def test_pick_address_handles_ambiguous_postal_codes():
+    candidates = [dict(entry) for entry in ENTRIES[:2]]
+    assert _pick_address(candidates, '23773', 'KEUDE BAKONGAN')['kelurahan'] == 'Keude Bakongan'
+    assert _pick_address(candidates[:1], '23773', '')['kelurahan'] == 'Bakongan'
+    with pytest.raises(ValueError, match='mencakup 2 kelurahan'):
+        _pick_address(candidates, '23773', '')
+    with pytest.raises(ValueError, match='Kelurahan Lain tidak ada'):
+        _pick_address(candidates, '23773', 'Lain')
+    with pytest.raises(ValueError, match='tidak ditemukan'):
+        _pick_address([], '99999', '')
+
+
+def test_generate_from_csv(environment):
+    parts, on_part = collect_parts()
+    summary = generate_bulk_resi('data.csv', csv_stream(CSV_ROWS), on_part, chunk_size=2)
+
+    assert summary['rows'] == 5
+    assert summary['success'] == 2
+    assert summary['parts'] == 1
+    assert [number for number, _ in summary['errors']] == [3, 4, 7]
+    assert 'Nama minimal 3 karakter' in summary['errors'][0][1]
+    assert 'mencakup 2 kelurahan' in summary['errors'][1][1]
+    assert 'tidak ditemukan' in summary['errors'][2][1]
+
+    [(number, data)] = parts
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ['00002_Budi Santoso.xlsx', '00006_Dodi Pratama.xlsx', 'errors.csv']
+        errors = list(csv.reader(io.StringIO(archive.read('errors.csv').decode('utf-8-sig'))))
+        label = load_workbook(io.BytesIO(archive.read('00006_Dodi Pratama.xlsx')))
+    assert errors[0] == ['baris', 'error']
+    assert [row[0] for row in errors[1:]] == ['3', '4', '7']
+    sheet = label.active
+    assert sheet['D34'].value == 'Dodi Pratama'
+    assert sheet['D36'].value == '08123456789'
+    assert 'Keude Bakongan' in sheet['D38'].value
+    assert sheet['B45'].value == 'LionParcel'
+    assert sheet['B47'].value == 'TIDAK'
+
+
+def test_generate_from_xlsx(environment):
+    stream = xlsx_stream([
+        ["Nama", "HP", "Alamat", "Kode Pos", "Kurir", "COD"],
+        ["Budi Santoso", 81234567890, "Jl. Merdeka No. 5 RT 01", 10110, "SiCepat", "ya"],
+        ["Ani Lestari", 81234567891, "Jl. Merdeka No. 6 RT 01", 10110, "JNE", "tidak"],
+    ])
+    parts, on_part = collect_parts()
+    summary = generate_bulk_resi('data.xlsx', stream, on_part)
+
+    assert summary == {'rows': 2, 'success': 2, 'errors': [], 'parts': 1}
+    assert zip_names(parts[0][1]) == ['00002_Budi Santoso.xlsx', '00003_Ani Lestari.xlsx']
+
+
+def test_row_limit_reports_first_skipped_row(environment):
+    parts, on_part = collect_parts()
+    summary = generate_bulk_resi('data.csv', csv_stream(CSV_ROWS[:3] + CSV_ROWS[5:6]), on_part, max_rows=2)
+
+    assert summary['rows'] == 2
+    assert summary['errors'][-1][0] == 4
+    assert 'Melebihi batas 2 baris' in summary['errors'][-1][1]
+
+
+def test_parts_are_split_by_size(environment):
+    lines = [CSV_ROWS[0]] + [
+        f"Penerima {i};081234567{i:03d};Jl. Merdeka No. {i} RT 01;10110;JNE;ya;" for i in range(5)
+    ]
+    parts, on_part = collect_parts()
+    summary = generate_bulk_resi('data.csv', csv_stream(lines), on_part, max_part_bytes=1)
+
+    assert summary['success'] == 5
+    assert summary['parts'] == 5
+    assert [number for number, _ in parts] == [1, 2, 3, 4, 5]
+    assert [zip_names(data) for _, data in parts] == [[f'{i + 2:05d}_Penerima {i}.xlsx'] for i in range(5)]
+
+
+def test_no_part_is_sent_when_every_row_fails(environment):
+    parts, on_part = collect_parts()
+    summary = generate_bulk_resi('data.csv', csv_stream([CSV_ROWS[0], CSV_ROWS[2]]), on_part)
+
+    assert parts == []
+    assert summary['success'] == 0
+    assert summary['parts'] == 0
+    assert len(summary['errors']) == 1
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from bot.mengantar_client import MengantarClient, MengantarBusyError
+
+AUTOFILL = '/api/address/autofill'
+OK = (200, {"success": True, "data": [{"_id": "dest-1"}]}, {})
+
+
+def make_client(stub, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    return MengantarClient(base_url=stub.url, **kwargs)
+
+
+def test_autofill_sends_keyword(stub):
+    stub.route(AUTOFILL, OK)
+    client = make_client(stub)
+    try:
+        response = client.autofill('23773')
+    finally:
+        client.close()
+
+    assert response.json()['data'][0]['_id'] == 'dest-1'
+    assert stub.requests == [(AUTOFILL, {'keyword': '23773'})]
+
+
+def test_read_timeout_is_bounded(stub):
+    stub.route(AUTOFILL, stub.delayed(2, OK))
+    client = make_client(stub, read_timeout=0.2, retries=0)
+    started = time.monotonic()
+    try:
+        with pytest.raises(requests.RequestException):
+            client.autofill('23773')
+    finally:
+        client.close()
+    assert time.monotonic() - started < 1.5
+
+
+def test_server_errors_are_retried(stub):
+    stub.route(AUTOFILL, (503, {}, {}))
+    client = make_client(stub, retries=2)
+    try:
+        response = client.autofill('23773')
+    finally:
+        client.close()
+
+    assert response.status_code == 503
+    assert stub.count(AUTOFILL) == 3
+
+
+def test_rate_limit_is_not_retried_or_slept_on(stub):
+    stub.route(AUTOFILL, (429, {}, {'Retry-After': '3600'}))
+    client = make_client(stub, retries=2)
+    started = time.monotonic()
+    try:
+        response = client.autofill('23773')
+    finally:
+        client.close()
+
+    assert response.status_code == 429
+    assert stub.count(AUTOFILL) == 1
+    assert time.monotonic() - started < 1
+
+
+def test_offline_retry_after_is_capped(stub):
+    stub.route(AUTOFILL, (429, {}, {'Retry-After': '3600'}))
+    client = make_client(stub, retries=1, retry_rate_limited=True, retry_after_max=0)
+    started = time.monotonic()
+    try:
+        response = client.autofill('23773')
+    finally:
+        client.close()
+
+    assert response.status_code == 429
+    assert stub.count(AUTOFILL) == 2
+    assert time.monotonic() - started < 1
+
+
+def test_in_flight_limit_raises_busy(stub):
+    stub.route(AUTOFILL, stub.delayed(0.5, OK))
+    client = make_client(stub, max_in_flight=1, acquire_timeout=0.05)
+    first = threading.Thread(target=client.autofill, args=('23773',))
+    first.start()
+    try:
+        while not stub.requests:
+            time.sleep(0.01)
+        with pytest.raises(MengantarBusyError):
+            client.autofill('23774')
+    finally:
+        first.join()
+        client.close()
+
+    assert stub.count(AUTOFILL) == 1
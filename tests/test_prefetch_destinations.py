@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from bot.mengantar_client import MengantarClient
+from bot.prefetch_destinations import prefetch
+from bot.shipping_cache import DestinationCache
+
+AUTOFILL = '/api/address/autofill'
+
+
+def autofill(query):
+    keyword = query['keyword']
+    if keyword == '23773':
+        return 200, {"success": True, "data": [{"_id": "dest-23773"}]}, {}
+    if keyword == '23774':
+        return 200, {"success": True, "data": []}, {}
+    return 500, {}, {}
+
+
+def test_prefetch_skips_cached_and_counts_outcomes(stub, tmp_path):
+    stub.route(AUTOFILL, autofill)
+    path = str(tmp_path / 'destinations.sqlite3')
+    cache = DestinationCache(path)
+    cache.put('23775', 'dest-23775')
+    store = SimpleNamespace(kode_pos_keys=['23773', '23774', '23775', '23776', ''])
+    client = MengantarClient(base_url=stub.url, retries=0)
+    try:
+        stats = prefetch(store, cache, client, concurrency=2, rate=0, batch_size=1)
+    finally:
+        client.close()
+        cache.close()
+
+    assert stats == {'total': 3, 'resolved': 1, 'missing': 1, 'failed': 1}
+    assert sorted(query['keyword'] for _, query in stub.requests) == ['23773', '23774', '23776']
+
+    reopened = DestinationCache(path)
+    try:
+        assert reopened.get('23773') == 'dest-23773'
+        assert reopened.get('23775') == 'dest-23775'
+        assert '23774' not in reopened
+    finally:
+        reopened.close()
+
+
+def test_prefetch_rerun_only_requests_unresolved(stub, tmp_path):
+    stub.route(AUTOFILL, autofill)
+    cache = DestinationCache(str(tmp_path / 'destinations.sqlite3'))
+    store = SimpleNamespace(kode_pos_keys=['23773', '23774'])
+    client = MengantarClient(base_url=stub.url, retries=0)
+    try:
+        prefetch(store, cache, client, rate=0)
+        stub.requests.clear()
+        stats = prefetch(store, cache, client, rate=0)
+    finally:
+        client.close()
+        cache.close()
+
+    assert stats == {'total': 1, 'resolved': 0, 'missing': 1, 'failed': 0}
+    assert stub.requests == [(AUTOFILL, {'keyword': '23774'})]
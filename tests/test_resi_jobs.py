@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from bot.resi_jobs import JobQueue, QueueFullError
+from conftest import wait_until
+
+
+def blocked_queue(**kwargs):
+    # Antrean dengan satu worker yang sedang ditahan pekerjaan lain.
+    queue = JobQueue('test', workers=1, **kwargs)
+    release = threading.Event()
+    queue.submit('blocker', release.wait, 5)
+    assert wait_until(lambda: queue.stats()['running'] == 1)
+    return queue, release
+
+
+def test_jobs_for_one_key_run_in_order_and_never_concurrently():
+    queue = JobQueue('test', workers=4, max_per_key=50)
+    done = []
+    running = []
+    overlaps = []
+
+    def job(i):
+        running.append(i)
+        if len(running) > 1:
+            overlaps.append(i)
+        time.sleep(0.001)
+        running.remove(i)
+        done.append(i)
+
+    for i in range(30):
+        queue.submit('user', job, i)
+    assert wait_until(lambda: len(done) == 30)
+    assert done == list(range(30))
+    assert overlaps == []
+
+
+def test_other_keys_run_while_one_key_is_busy():
+    queue = JobQueue('test', workers=2)
+    release = threading.Event()
+    finished = threading.Event()
+    queue.submit('slow', release.wait, 5)
+    queue.submit('slow', finished.set)
+    queue.submit('fast', finished.set)
+    try:
+        assert finished.wait(1)
+        assert queue.stats()['queued'] == 1
+    finally:
+        release.set()
+    assert wait_until(lambda: queue.stats()['completed'] == 3)
+
+
+def test_per_key_limit_rejects():
+    queue, release = blocked_queue(max_per_key=2)
+    try:
+        queue.submit('user', time.sleep, 0)
+        queue.submit('user', time.sleep, 0)
+        with pytest.raises(QueueFullError):
+            queue.submit('user', time.sleep, 0)
+        queue.submit('other', time.sleep, 0)
+    finally:
+        release.set()
+    assert wait_until(lambda: queue.stats()['completed'] == 4)
+    assert queue.stats()['rejected'] == 1
+
+
+def test_global_limit_rejects():
+    queue, release = blocked_queue(max_pending=2)
+    try:
+        assert queue.submit('a', time.sleep, 0) == 1
+        assert queue.submit('b', time.sleep, 0) == 2
+        with pytest.raises(QueueFullError):
+            queue.submit('c', time.sleep, 0)
+    finally:
+        release.set()
+    assert wait_until(lambda: queue.stats()['queued'] == 0)
+
+
+def test_failed_job_is_counted_and_key_keeps_running():
+    queue = JobQueue('test', workers=1)
+    done = threading.Event()
+
+    def fail():
+        raise RuntimeError("render gagal")
+
+    queue.submit('user', fail)
+    queue.submit('user', done.set)
+    assert done.wait(1)
+    assert wait_until(lambda: queue.stats()['completed'] == 1)
+
+    stats = queue.stats()
+    assert stats['submitted'] == 2
+    assert stats['failed'] == 1
+    assert stats['running'] == 0
+    assert stats['workers'] == 1
+    assert set(stats['wait_seconds']) == {'p50', 'p95', 'max'}
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+from bot.resi_renderer import RESI_CELLS, ResiTemplate, resi_cells
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'label.xlsx')
+
+USER_DATA = {
+    "name": 'Budi <b>"Santoso"</b> & Putri\x01',
+    "phone": "081234567890",
+    "address": "Jl. Merdeka No. 5 RT 01/RW 02 <belakang masjid>\x0b's",
+    "courier": "JNE",
+    "cod": "YES",
+}
+ADDRESS = {
+    "kelurahan": "Keude Bakongan",
+    "kecamatan": "Bakongan",
+    "kota": "Kab. Aceh Selatan",
+    "provinsi": "Aceh",
+    "kode_pos": 23773,
+}
+EXPECTED = {
+    "D34": 'Budi <b>"Santoso"</b> & Putri',
+    "D36": "081234567890",
+    "D38": "Jl. Merdeka No. 5 RT 01/RW 02 <belakang masjid>'s, Keude Bakongan, Bakongan, Kab. Aceh Selatan, Aceh",
+    "D41": 23773,
+    "B45": "JNE",
+    "B47": "IYA",
+}
+
+
+@pytest.fixture(scope='module')
+def template():
+    return ResiTemplate(TEMPLATE_PATH)
+
+
+def read_cells(output):
+    workbook = load_workbook(output)
+    try:
+        sheet = workbook.active
+        return {ref: sheet[ref].value for ref in RESI_CELLS}, sheet
+    finally:
+        workbook.close()
+
+
+def other_cells(sheet):
+    return {
+        cell.coordinate: (cell.value, cell.style_id)
+        for row in sheet.iter_rows() for cell in row
+        if cell.coordinate not in RESI_CELLS and (cell.value is not None or cell.has_style)
+    }
+
+
+def test_template_is_compiled(template):
+    assert template.pieces is not None
+    assert sorted(ref for ref, _ in template.slots) == sorted(RESI_CELLS)
+
+
+def test_render_writes_escaped_values(template):
+    values, _ = read_cells(template.render(resi_cells(USER_DATA, ADDRESS)))
+    assert values == EXPECTED
+
+
+def test_render_keeps_the_rest_of_the_sheet(template):
+    _, rendered = read_cells(template.render(resi_cells(USER_DATA, ADDRESS)))
+    workbook = load_workbook(TEMPLATE_PATH)
+    try:
+        original = workbook.active
+        assert other_cells(original)
+        assert other_cells(rendered) == other_cells(original)
+        for ref in RESI_CELLS:
+            assert rendered[ref].style_id == original[ref].style_id
+    finally:
+        workbook.close()
+
+
+def test_renders_are_independent(template):
+    first = template.render(resi_cells(USER_DATA, ADDRESS))
+    second = template.render(resi_cells(dict(USER_DATA, name="Ani", cod="NO"), ADDRESS))
+    assert read_cells(first)[0]["D34"] == EXPECTED["D34"]
+    values, _ = read_cells(second)
+    assert values["D34"] == "Ani"
+    assert values["B47"] == "TIDAK"
+
+
+def test_openpyxl_fallback_renders_same_values(template):
+    fallback = ResiTemplate(TEMPLATE_PATH, cells=RESI_CELLS + ["ZZ999"])
+    assert fallback.pieces is None
+
+    values, _ = read_cells(fallback.render(resi_cells(USER_DATA, ADDRESS)))
+    assert values == EXPECTED
+    assert read_cells(template.render_with_openpyxl(resi_cells(USER_DATA, ADDRESS)))[0] == EXPECTED
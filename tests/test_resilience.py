@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from bot.resilience import CircuitBreaker, SingleFlight, CLOSED, OPEN, HALF_OPEN
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_failure_rate():
+    breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4, window=4, reset_timeout=30)
+    for _ in range(3):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+    assert breaker.stats()['opened'] == 1
+
+
+def test_breaker_stays_closed_below_failure_rate():
+    breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4, window=4)
+    for ok in (True, False, True, True, True, False):
+        assert breaker.allow()
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_failures'] == 1
+
+
+def test_half_open_allows_single_trial_then_closes():
+    breaker = CircuitBreaker('test', min_calls=2, window=2, reset_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert breaker.stats()['window_failures'] == 0
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker('test', min_calls=2, window=2, reset_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['opened'] == 2
+
+
+def test_single_flight_shares_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'estimate'
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do('23773', fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()['executed'] + flight.stats()['shared'] < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['estimate'] * 5
+    assert flight.stats() == {'executed': 1, 'shared': 4, 'in_flight': 0}
+
+
+def test_single_flight_propagates_errors_and_forgets_key():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        flight.do('23773', fail)
+    assert flight.do('23773', lambda: 'ok') == 'ok'
+    assert flight.stats()['executed'] == 2
@@ -0,0 +1,100 @@
+import json
+import time
+
+import pytest
+
+from bot import address_store
+from bot.address_store import AddressStore, StoreReloader, get_store, normalize_query, set_store
+from bot.bot_utils import search_address, search_cache
+from bot.query_cache import QueryCache
+
+ENTRIES = [
+    {"kelurahan": "Bakongan", "kecamatan": "Bakongan", "kota": "Kab. Aceh Selatan", "provinsi": "Aceh",
+     "kode_pos": "23773", "kode_kemendagri": "11.01.01.2001"},
+    {"kelurahan": "Keude Bakongan", "kecamatan": "Bakongan", "kota": "Kab. Aceh Selatan", "provinsi": "Aceh",
+     "kode_pos": "23773", "kode_kemendagri": "11.01.01.2002"},
+    {"kelurahan": "Gambir", "kecamatan": "Gambir", "kota": "Kota Jakarta Pusat", "provinsi": "DKI Jakarta",
+     "kode_pos": "10110", "kode_kemendagri": "31.73.01.1001"},
+]
+
+
+@pytest.fixture
+def store():
+    previous = address_store._store
+    store = AddressStore.from_entries(ENTRIES)
+    set_store(store)
+    search_cache.clear()
+    yield store
+    set_store(previous)
+    search_cache.clear()
+
+
+@pytest.mark.parametrize('a, b', [
+    ("Bakongan Aceh", "aceh   BAKONGAN"),
+    ("bakongan bakongan", "bakongan"),
+    ("KOTA:Aceh kelurahan:keude", "kelurahan:KEUDE kota:aceh"),
+    ("foo:bar bakongan", "bakongan"),
+    ("23773", " 23773 "),
+])
+def test_equivalent_queries_share_a_key(a, b):
+    assert normalize_query(a) == normalize_query(b)
+
+
+@pytest.mark.parametrize('a, b', [
+    ("23773", "kode_pos:23773"),
+    ("bakongan", "kelurahan:bakongan"),
+    ("bakongan", "bakongan aceh"),
+])
+def test_different_queries_have_different_keys(a, b):
+    assert normalize_query(a) != normalize_query(b)
+
+
+def test_equivalent_queries_reuse_cached_cursor(store):
+    first = search_address("Bakongan Aceh")
+    hits = search_cache.stats()['hits']
+    assert search_address("aceh  bakongan") is first
+    assert search_cache.stats()['hits'] == hits + 1
+    assert search_address("Bakongan Aceh", limit=1) is not first
+
+
+def test_query_cache_expires_and_evicts():
+    cache = QueryCache(maxsize=2, ttl=0.05)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('c') is None
+    assert cache.stats()['size'] == 1
+
+
+def test_store_swap_invalidates_cached_results(store):
+    assert len(search_address("gambir")) == 1
+    set_store(AddressStore.from_entries([dict(ENTRIES[2], kelurahan="Gambir Baru")] + ENTRIES))
+    assert len(search_address("gambir")) == 2
+
+
+def test_reloader_swaps_store_once_file_is_stable(store, tmp_path):
+    source = tmp_path / 'kodepos.json'
+    source.write_text(json.dumps(ENTRIES))
+    reloader = StoreReloader(
+        interval=60,
+        path=str(source),
+        snapshot_path=str(tmp_path / 'kodepos.snapshot'),
+        on_reload=lambda store: search_cache.clear()
+    )
+    assert not reloader.check()
+    cursor = search_address("gambir")
+
+    source.write_text(json.dumps(ENTRIES + [dict(ENTRIES[2], kelurahan="Gambir Baru")]))
+    assert not reloader.check()
+    assert get_store() is store
+
+    assert reloader.check()
+    assert get_store() is not store
+    assert len(get_store()) == 4
+    assert search_cache.stats()['size'] == 0
+    assert len(search_address("gambir")) == 2
+    assert len(cursor) == 1
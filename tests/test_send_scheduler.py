@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+from telebot import apihelper
+
+from bot.send_scheduler import Outbox, SendScheduler, retry_after
+
+
+def flood(seconds, exception=apihelper.ApiTelegramException):
+    return exception('sendMessage', None, {
+        'error_code': 429,
+        'description': 'Too Many Requests',
+        'parameters': {'retry_after': seconds}
+    })
+
+
+class FakeBot:
+    # Mencatat kiriman yang berhasil; `failures` berisi exception yang
+    # dilempar (sekali) untuk teks/callback id tertentu, `gates` menahan
+    # kiriman sampai event-nya diset.
+    def __init__(self):
+        self.sent = []
+        self.failures = {}
+        self.gates = {}
+        self.lock = threading.Lock()
+
+    def _call(self, key, record):
+        gate = self.gates.get(key)
+        if gate is not None:
+            gate.wait(5)
+        with self.lock:
+            error = self.failures.pop(key, None)
+            if error is None:
+                self.sent.append(record)
+        if error is not None:
+            raise error
+        return record
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self._call(text, (chat_id, text))
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        return self._call(text, (chat_id, text))
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        return self._call(callback_query_id, ('answer', callback_query_id))
+
+    def texts(self, chat_id):
+        with self.lock:
+            return [text for sent_chat, text in self.sent if sent_chat == chat_id]
+
+
+def test_retry_after_reads_sync_and_async_exceptions():
+    asyncio_helper = pytest.importorskip('telebot.asyncio_helper')
+    assert retry_after(flood(5)) == 5
+    assert retry_after(flood(5, asyncio_helper.ApiTelegramException)) == 5
+    assert retry_after(RuntimeError("boom")) is None
+
+
+def make_outbox(**kwargs):
+    kwargs.setdefault('global_rate', 1000)
+    kwargs.setdefault('global_burst', 1000)
+    kwargs.setdefault('chat_rate', 1000)
+    kwargs.setdefault('chat_burst', 1000)
+    bot = FakeBot()
+    return bot, Outbox(bot, SendScheduler(**kwargs))
+
+
+def test_callback_flood_wait_does_not_block_chats():
+    bot, outbox = make_outbox()
+    bot.failures['cb-1'] = flood(30)
+    outbox.answer_callback_query('cb-1')
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    outbox.send_message(1, 'halo').result(timeout=1)
+    assert time.monotonic() - started < 0.5
+
+    stats = outbox.scheduler.stats()
+    assert stats['rate_limited'] == 1
+    assert stats['queued'] == 1
+
+
+def test_messages_keep_per_chat_order():
+    bot, outbox = make_outbox(workers=4)
+    futures = []
+    for i in range(20):
+        for chat_id in (1, 2, 3):
+            futures.append(outbox.send_message(chat_id, f'{chat_id}-{i}'))
+    for future in futures:
+        future.result(timeout=2)
+
+    for chat_id in (1, 2, 3):
+        assert bot.texts(chat_id) == [f'{chat_id}-{i}' for i in range(20)]
+
+
+def test_chat_flood_wait_retries_in_order_without_delaying_other_chats():
+    bot, outbox = make_outbox()
+    bot.failures['a'] = flood(0.3)
+    first = outbox.send_message(1, 'a')
+    outbox.send_message(1, 'b')
+    last = outbox.send_message(1, 'c')
+
+    outbox.send_message(2, 'x').result(timeout=1)
+    assert not first.done()
+
+    last.result(timeout=2)
+    assert bot.texts(1) == ['a', 'b', 'c']
+    assert outbox.scheduler.stats()['rate_limited'] == 1
+
+
+def test_pending_edits_are_coalesced():
+    bot, outbox = make_outbox()
+    bot.gates['busy'] = gate = threading.Event()
+    outbox.send_message(1, 'busy')
+    time.sleep(0.05)
+
+    futures = [outbox.edit_message_text(f'page {i}', chat_id=1, message_id=7) for i in range(1, 4)]
+    gate.set()
+    futures[-1].result(timeout=1)
+
+    assert futures[0] is futures[-1]
+    assert bot.texts(1) == ['busy', 'page 3']
+    assert outbox.scheduler.stats()['coalesced'] == 2
+
+
+def test_async_flood_wait_is_retried():
+    asyncio_helper = pytest.importorskip('telebot.asyncio_helper')
+    bot, outbox = make_outbox()
+    bot.failures['a'] = flood(0.1, asyncio_helper.ApiTelegramException)
+    outbox.send_message(1, 'a').result(timeout=2)
+
+    assert bot.texts(1) == ['a']
+    stats = outbox.scheduler.stats()
+    assert stats['rate_limited'] == 1
+    assert stats['failed'] == 0
+
+
+def test_chat_rate_limit_spaces_messages():
+    bot, outbox = make_outbox(chat_rate=20, chat_burst=1)
+    started = time.monotonic()
+    futures = [outbox.send_message(1, str(i)) for i in range(5)]
+    for future in futures:
+        future.result(timeout=2)
+    assert time.monotonic() - started >= 0.18
+    assert bot.texts(1) == ['0', '1', '2', '3', '4']
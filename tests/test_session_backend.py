@@ -0,0 +1,171 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from bot.session_backend import SQLiteBackend
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'sessions.sqlite3')
+
+
+def make_backend(path, busy_timeout_ms=50):
+    # Flush hanya dipanggil manual di test; thread flush praktis tidur terus.
+    backend = SQLiteBackend(path=path, flush_interval=3600)
+    backend.conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+    return backend
+
+
+def hold_write_lock(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    return conn
+
+
+def test_values_are_shared_after_flush(db_path):
+    writer = make_backend(db_path)
+    reader = make_backend(db_path)
+    writer.set('42', {'page': 2})
+    assert writer.get('42') == {'page': 2}
+    assert reader.get('42') is None
+
+    writer.flush()
+    assert reader.get('42') == {'page': 2}
+
+    writer.delete('42')
+    writer.flush()
+    assert reader.get('42') is None
+    assert writer.stats()['flushed'] == 2
+
+
+def test_expired_values_are_not_returned(db_path):
+    backend = make_backend(db_path)
+    backend.set('42', 'x', ttl=0.05)
+    backend.flush()
+    time.sleep(0.06)
+    assert backend.get('42') is None
+    assert len(backend) == 0
+
+
+def test_failed_flush_keeps_pending_writes(db_path):
+    backend = make_backend(db_path)
+    backend.set('42', 'x')
+    locker = hold_write_lock(db_path)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            backend.flush()
+        assert backend.get('42') == 'x'
+        assert backend.stats()['pending'] == 1
+    finally:
+        locker.execute("ROLLBACK")
+        locker.close()
+
+    backend.flush()
+    assert make_backend(db_path).get('42') == 'x'
+    assert backend.stats()['pending'] == 0
+
+
+def test_newer_write_wins_over_failed_batch(db_path):
+    backend = make_backend(db_path, busy_timeout_ms=300)
+    backend.set('42', 'old')
+    locker = hold_write_lock(db_path)
+    errors = []
+
+    def flush():
+        try:
+            backend.flush()
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=flush)
+    thread.start()
+    try:
+        while not backend.flushing:
+            time.sleep(0.005)
+        backend.set('42', 'new')
+        thread.join()
+    finally:
+        locker.execute("ROLLBACK")
+        locker.close()
+
+    assert errors
+    backend.flush()
+    assert make_backend(db_path).get('42') == 'new'
+
+
+def test_get_is_not_blocked_by_waiting_flush(db_path):
+    backend = make_backend(db_path, busy_timeout_ms=2000)
+    backend.set('stored', 'a')
+    backend.flush()
+    backend.set('42', 'x')
+    locker = hold_write_lock(db_path)
+    thread = threading.Thread(target=lambda: backend.flush())
+    thread.start()
+    try:
+        while not backend.flushing:
+            time.sleep(0.005)
+        started = time.monotonic()
+        assert backend.get('42') == 'x'
+        assert backend.get('stored') == 'a'
+        assert time.monotonic() - started < 0.5
+        assert thread.is_alive()
+    finally:
+        locker.execute("ROLLBACK")
+        locker.close()
+        thread.join()
+
+    assert backend.stats()['pending'] == 0
+
+
+def test_locked_read_modify_write_is_atomic_across_processes(db_path):
+    # Dua instance dengan koneksi dan lock sendiri-sendiri mewakili dua
+    # proses worker yang melayani pengguna yang sama.
+    workers = [make_backend(db_path, busy_timeout_ms=5000) for _ in range(2)]
+    workers[0].set('42', {'count': 0})
+    workers[0].flush()
+
+    def increment(backend):
+        for _ in range(25):
+            with backend.locked('42'):
+                state = backend.get('42')
+                backend.set('42', dict(state, count=state['count'] + 1))
+
+    threads = [threading.Thread(target=increment, args=(backend,)) for backend in workers for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert make_backend(db_path).get('42') == {'count': 100}
+
+
+def test_locked_commits_pending_and_body_writes(db_path):
+    writer = make_backend(db_path)
+    other = make_backend(db_path)
+    writer.set('1', 'buffered')
+    with writer.locked('2'):
+        assert writer.get('1') == 'buffered'
+        writer.set('2', 'now')
+
+    assert other.get('1') == 'buffered'
+    assert other.get('2') == 'now'
+    assert writer.stats()['pending'] == 0
+
+
+def test_failed_locked_block_rolls_back_but_keeps_pending(db_path):
+    backend = make_backend(db_path)
+    backend.set('1', 'buffered')
+    with pytest.raises(RuntimeError):
+        with backend.locked('2'):
+            backend.set('2', 'partial')
+            raise RuntimeError("gagal")
+
+    other = make_backend(db_path)
+    assert other.get('2') is None
+    assert other.get('1') is None
+    assert backend.stats()['pending'] == 1
+    backend.flush()
+    assert other.get('1') == 'buffered'
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from bot.address_store import AddressStore, load_store
+from bot.benchmark import generate_entries
+from bot.snapshot import SnapshotError, ValueTable
+
+QUERIES = ["", "a", "ba sa", "kota:kab", "kelurahan:a provinsi:a", "2", "20", "kode_pos:20000", "jaya"]
+
+
+def rows(cursor):
+    return [dict(record) for record in cursor]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    source = tmp_path / 'kodepos.json'
+    source.write_text(json.dumps(generate_entries(1500, seed=3)))
+    snapshot = tmp_path / 'kodepos.snapshot'
+    AddressStore.load(str(source)).save_snapshot(str(snapshot), str(source))
+    return str(source), str(snapshot)
+
+
+def test_snapshot_round_trip_gives_same_results(paths):
+    source, snapshot = paths
+    original = AddressStore.load(source)
+    restored = AddressStore.from_snapshot(snapshot, source)
+
+    assert len(restored) == len(original)
+    assert restored.kode_pos_keys == original.kode_pos_keys
+    for query in QUERIES:
+        assert rows(restored.search(query)) == rows(original.search(query)), query
+
+
+def test_load_store_prefers_snapshot(paths):
+    source, snapshot = paths
+    assert isinstance(load_store(source, snapshot).values, ValueTable)
+
+
+def test_stale_snapshot_falls_back_to_source(paths):
+    source, snapshot = paths
+    with open(source) as f:
+        entries = json.load(f)
+    entries.append(dict(entries[0], kelurahan="Kelurahan Baru"))
+    with open(source, 'w') as f:
+        json.dump(entries, f)
+
+    with pytest.raises(SnapshotError):
+        AddressStore.from_snapshot(snapshot, source)
+    store = load_store(source, snapshot)
+    assert isinstance(store.values, list)
+    assert len(store) == len(entries)
+    assert len(store.search("kelurahan:baru")) >= 1
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: b'',
+    lambda data: data[:10],
+    lambda data: b'XXXX' + data[4:],
+    lambda data: data[:len(data) // 2],
+])
+def test_corrupt_snapshot_falls_back_to_source(paths, corrupt):
+    source, snapshot = paths
+    with open(snapshot, 'rb') as f:
+        data = f.read()
+    with open(snapshot, 'wb') as f:
+        f.write(corrupt(data))
+
+    with pytest.raises(SnapshotError):
+        AddressStore.from_snapshot(snapshot, source)
+    store = load_store(source, snapshot)
+    assert len(store) == 1500
@@ -0,0 +1,60 @@
+import time
+
+from bot.state_store import StateStore
+from conftest import wait_until
+
+
+def test_get_returns_none_after_ttl():
+    store = StateStore(ttl=0.05)
+    store.set('a', 1)
+    assert store.get('a') == 1
+    time.sleep(0.06)
+    assert store.get('a') is None
+
+
+def test_per_key_ttl_overrides_default():
+    store = StateStore(ttl=0.05)
+    store.set('a', 1, ttl=30)
+    store.set('b', 2)
+    time.sleep(0.06)
+    assert store.get('a') == 1
+    assert store.get('b') is None
+
+
+def test_background_expiry_removes_untouched_entries():
+    store = StateStore(ttl=0.05)
+    store.set('a', 1)
+    store.set('b', 2, ttl=30)
+    assert wait_until(lambda: len(store) == 1)
+    assert store.get('b') == 2
+    assert store.stats()['expired'] == 1
+
+
+def test_reset_key_is_not_expired_by_old_deadline():
+    store = StateStore(ttl=0.05)
+    store.set('a', 1)
+    store.set('a', 2, ttl=30)
+    time.sleep(0.1)
+    assert store.get('a') == 2
+    assert store.stats()['expired'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    store = StateStore(ttl=30, max_entries=2)
+    store.set('a', 1)
+    store.set('b', 2)
+    store.get('a')
+    store.set('c', 3)
+
+    assert store.get('b') is None
+    assert store.get('a') == 1
+    assert store.get('c') == 3
+    assert store.stats() == {'size': 2, 'max_entries': 2, 'expired': 0, 'evicted': 1}
+
+
+def test_heap_is_rebuilt_when_keys_are_reset_often():
+    store = StateStore(ttl=30)
+    for i in range(3000):
+        store.set('a', i)
+    assert len(store.heap) <= 2 * len(store) + 1025
+    assert store.get('a') == 2999